@@ -7,6 +7,7 @@ import { useToast } from "@/hooks/use-toast";
 import { Profile } from "@shared/schema";
 import { Button } from "@/components/ui/button";
 import { Camera, X } from "lucide-react";
+import { photoUrl } from "@/lib/utils";
 
 interface PhotoUploadProps {
   profile: Profile | null;
@@ -19,9 +20,27 @@ export default function PhotoUpload({ profile }: PhotoUploadProps) {
     profile?.photos || []
   );
   
-  // In a real implementation, this would upload files to a storage service
-  // For this demo, we'll just use base64 encoding
-  const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
+  const [isUploading, setIsUploading] = useState(false);
+  
+  // Upload a file to the photo store and get the URL it is served from
+  const uploadPhoto = async (file: File): Promise<string> => {
+    const formData = new FormData();
+    formData.append("photo", file);
+    const res = await fetch(API_ENDPOINTS.PHOTOS.UPLOAD, {
+      method: "POST",
+      body: formData,
+      credentials: "include",
+    });
+    if (!res.ok) {
+      const text = (await res.text()) || res.statusText;
+      throw new Error(`${res.status}: ${text}`);
+    }
+    const { url } = await res.json();
+    return url;
+  };
+  
+  // Upload selected files; the profile only stores the returned URLs
+  const handleFileChange = async (e: React.ChangeEvent<HTMLInputElement>) => {
     const files = e.target.files;
     if (!files) return;
     
@@ -35,19 +54,26 @@ export default function PhotoUpload({ profile }: PhotoUploadProps) {
       return;
     }
     
-    // Read selected files and convert to base64
-    Array.from(files).forEach(file => {
-      const reader = new FileReader();
-      reader.onload = (event) => {
-        if (event.target?.result) {
-          setPreviewUrls(prev => [...prev, event.target!.result as string]);
-        }
-      };
-      reader.readAsDataURL(file);
-    });
+    const selected = Array.from(files);
     
     // Reset file input
     e.target.value = "";
+    
+    setIsUploading(true);
+    try {
+      for (const file of selected) {
+        const url = await uploadPhoto(file);
+        setPreviewUrls(prev => [...prev, url]);
+      }
+    } catch (error) {
+      toast({
+        title: "Upload failed",
+        description: (error as Error).message,
+        variant: "destructive",
+      });
+    } finally {
+      setIsUploading(false);
+    }
   };
   
   // Remove a photo
@@ -87,7 +113,7 @@ export default function PhotoUpload({ profile }: PhotoUploadProps) {
         {previewUrls.map((url, index) => (
           <div key={index} className="relative">
             <img 
-              src={url} 
+              src={photoUrl(url, "card")} 
               alt={`User photo ${index + 1}`}
               className="w-full h-32 object-cover rounded-lg"
             />
@@ -105,7 +131,7 @@ export default function PhotoUpload({ profile }: PhotoUploadProps) {
           <label className="w-full h-32 border-2 border-dashed border-neutral-300 rounded-lg flex items-center justify-center cursor-pointer hover:border-primary transition-colors">
             <div className="flex flex-col items-center gap-2 text-neutral-500">
               <Camera size={24} />
-              <span className="text-sm">Add Photo</span>
+              <span className="text-sm">{isUploading ? "Uploading..." : "Add Photo"}</span>
             </div>
             <input 
               type="file" 
@@ -113,6 +139,7 @@ export default function PhotoUpload({ profile }: PhotoUploadProps) {
               onChange={handleFileChange} 
               className="hidden" 
               multiple
+              disabled={isUploading}
             />
           </label>
         )}
@@ -123,7 +150,7 @@ export default function PhotoUpload({ profile }: PhotoUploadProps) {
           type="button"
           onClick={savePhotos}
           variant="gradient"
-          disabled={updatePhotosMutation.isPending}
+          disabled={updatePhotosMutation.isPending || isUploading}
         >
           {updatePhotosMutation.isPending ? "Saving..." : "Save Photos"}
         </Button>
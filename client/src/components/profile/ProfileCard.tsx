@@ -12,6 +12,7 @@ import {
 import InterestBadge from "@/components/profile/InterestBadge";
 import { MapPin, Info, X, Star } from "lucide-react";
 import { Heart } from "lucide-react";
+import { photoUrl } from "@/lib/utils";
 
 interface ProfileCardProps {
   user: User & { profile?: Profile };
@@ -87,7 +88,7 @@ export default function ProfileCard({ user, onLike, onSkip }: ProfileCardProps)
   
   // If no profile photo is available, show a fallback
   const profilePhoto = user.profile?.photos && user.profile.photos.length > 0 
-    ? user.profile.photos[0] 
+    ? photoUrl(user.profile.photos[0], "card") 
     : "https://via.placeholder.com/500x700?text=No+Photo";
   
   return (
@@ -23,6 +23,10 @@ export const API_ENDPOINTS = {
   MATCHES: {
     GET: '/api/matches',
     MESSAGES: (matchId: number) => `/api/matches/${matchId}/messages`,
+    MESSAGES_STREAM: (matchId: number) => `/api/matches/${matchId}/messages/stream`,
+  },
+  PHOTOS: {
+    UPLOAD: '/api/photos',
   },
 };
 
@@ -4,3 +4,8 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs))
 }
+
+// Stored photos can be served resized; other photo links are used as they are
+export function photoUrl(url: string, size?: "thumb" | "card") {
+  return size && url.startsWith("/api/photos/") ? `${url}?size=${size}` : url
+}
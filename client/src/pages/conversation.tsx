@@ -9,6 +9,7 @@ import MessageInput from "@/components/message/MessageInput";
 import { Message, User } from "@shared/schema";
 import { format } from "date-fns";
 import { ArrowLeft, MoreHorizontal } from "lucide-react";
+import { photoUrl } from "@/lib/utils";
 
 interface MatchWithDetails {
   id: number;
@@ -34,6 +35,7 @@ export default function Conversation() {
   const { user, isAuthenticated, isLoading: authLoading } = useAuth();
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const queryClient = useQueryClient();
+  const [isStreaming, setIsStreaming] = useState(false);
   
   // Redirect unauthenticated users to login
   useEffect(() => {
@@ -63,9 +65,39 @@ export default function Conversation() {
   } = useQuery<Message[]>({
     queryKey: [API_ENDPOINTS.MATCHES.MESSAGES(parseInt(matchId))],
     enabled: isAuthenticated && !!matchId,
-    refetchInterval: 5000, // Poll for new messages every 5 seconds
+    refetchInterval: isStreaming ? false : 5000, // Poll every 5 seconds unless messages are pushed
   });
   
+  // Receive new messages over Server-Sent Events, falling back to polling
+  useEffect(() => {
+    if (!isAuthenticated || !matchId || typeof EventSource === "undefined") {
+      return;
+    }
+    
+    const messagesKey = [API_ENDPOINTS.MATCHES.MESSAGES(parseInt(matchId))];
+    const source = new EventSource(API_ENDPOINTS.MATCHES.MESSAGES_STREAM(parseInt(matchId)), {
+      withCredentials: true,
+    });
+    
+    source.onopen = () => {
+      setIsStreaming(true);
+      // Catch up on anything sent while the stream was down
+      queryClient.invalidateQueries({ queryKey: messagesKey });
+    };
+    source.addEventListener("message", () => {
+      queryClient.invalidateQueries({ queryKey: messagesKey });
+    });
+    source.onerror = () => {
+      // Poll until the browser reconnects (or for good if streaming is unavailable)
+      setIsStreaming(false);
+    };
+    
+    return () => {
+      source.close();
+      setIsStreaming(false);
+    };
+  }, [isAuthenticated, matchId, queryClient]);
+  
   // Scroll to bottom when messages change
   useEffect(() => {
     if (messages?.length && messagesEndRef.current) {
@@ -144,7 +176,7 @@ export default function Conversation() {
           <div className="w-10 h-10 rounded-full overflow-hidden">
             {currentMatch?.otherProfile?.photos?.length ? (
               <img 
-                src={currentMatch.otherProfile.photos[0]} 
+                src={photoUrl(currentMatch.otherProfile.photos[0], "thumb")} 
                 alt={otherUser?.firstName || "Match"} 
                 className="w-full h-full object-cover" 
               />
@@ -5,6 +5,7 @@ import { API_ENDPOINTS, ROUTES } from "@/lib/constants";
 import { useAuth } from "@/hooks/use-auth";
 import { Avatar, AvatarFallback, AvatarImage } from "@/components/ui/avatar";
 import { formatDistanceToNow } from "date-fns";
+import { photoUrl } from "@/lib/utils";
 
 interface MatchWithDetails {
   id: number;
@@ -90,7 +91,7 @@ export default function Matches() {
                       <div className="w-20 h-20 rounded-full overflow-hidden ring-2 ring-primary p-1 bg-white">
                         {match.otherProfile?.photos?.length ? (
                           <img 
-                            src={match.otherProfile.photos[0]} 
+                            src={photoUrl(match.otherProfile.photos[0], "thumb")} 
                             alt={match.otherUser?.firstName || "Match"} 
                             className="w-full h-full object-cover rounded-full" 
                           />
@@ -130,7 +131,7 @@ export default function Matches() {
                       <div className="w-14 h-14 rounded-full overflow-hidden">
                         {match.otherProfile?.photos?.length ? (
                           <img 
-                            src={match.otherProfile.photos[0]} 
+                            src={photoUrl(match.otherProfile.photos[0], "thumb")} 
                             alt={match.otherUser?.firstName || "Match"} 
                             className="w-full h-full object-cover" 
                           />
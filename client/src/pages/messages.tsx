@@ -5,6 +5,7 @@ import { API_ENDPOINTS, ROUTES } from "@/lib/constants";
 import { useAuth } from "@/hooks/use-auth";
 import { Avatar, AvatarFallback, AvatarImage } from "@/components/ui/avatar";
 import { formatDistanceToNow } from "date-fns";
+import { photoUrl } from "@/lib/utils";
 
 interface MatchWithDetails {
   id: number;
@@ -84,7 +85,7 @@ export default function Messages() {
                     <div className="w-14 h-14 rounded-full overflow-hidden">
                       {match.otherProfile?.photos?.length ? (
                         <img 
-                          src={match.otherProfile.photos[0]} 
+                          src={photoUrl(match.otherProfile.photos[0], "thumb")} 
                           alt={match.otherUser?.firstName || "Match"} 
                           className="w-full h-full object-cover" 
                         />
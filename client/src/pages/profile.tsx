@@ -12,6 +12,7 @@ import ProfileForm from "@/components/profile/ProfileForm";
 import PhotoUpload from "@/components/profile/PhotoUpload";
 import InterestBadge from "@/components/profile/InterestBadge";
 import { Camera, MapPin, Edit } from "lucide-react";
+import { photoUrl } from "@/lib/utils";
 
 export default function ProfilePage() {
   const [_, setLocation] = useLocation();
@@ -75,7 +76,7 @@ export default function ProfilePage() {
                   <div className="w-32 h-32 rounded-full border-4 border-white overflow-hidden">
                     {profile?.photos?.length ? (
                       <img 
-                        src={profile.photos[0]} 
+                        src={photoUrl(profile.photos[0], "card")} 
                         alt={user.firstName} 
                         className="w-full h-full object-cover" 
                       />
@@ -179,7 +180,7 @@ export default function ProfilePage() {
                       {profile.photos.map((photo, index) => (
                         <img 
                           key={index}
-                          src={photo} 
+                          src={photoUrl(photo, "card")} 
                           alt={`Photo ${index + 1}`} 
                           className="w-full h-32 object-cover rounded-lg" 
                         />
@@ -4,7 +4,11 @@ from python_backend.models.db import db
 from python_backend.models.models import User, Profile
 from python_backend.utils.auth import hash_password, verify_password, generate_token, is_valid_email
 from python_backend.utils.email_service import send_verification_email
-from python_backend.utils.helpers import calculate_age
+from python_backend.utils.helpers import calculate_age, parse_date
+from python_backend.utils.ranking_cache import ranking_snapshots
+from python_backend.utils.photo_store import store_photos
+from python_backend.utils.serializers import serialize
+from python_backend.utils.request_cache import current_user
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -23,6 +27,11 @@ def register():
     if not is_valid_email(data['email']):
         return jsonify({"error": "Invalid email format"}), 400
     
+    # Validate date of birth
+    date_of_birth = parse_date(data['date_of_birth'])
+    if not date_of_birth:
+        return jsonify({"error": "Invalid date of birth, expected YYYY-MM-DD"}), 400
+    
     # Check if username already exists
     if User.query.filter_by(username=data['username']).first():
         return jsonify({"error": "Username already exists"}), 400
@@ -35,6 +44,12 @@ def register():
     if 'phone_number' in data and data['phone_number'] and User.query.filter_by(phone_number=data['phone_number']).first():
         return jsonify({"error": "Phone number already exists"}), 400
     
+    # Inline photos go to the photo store, the profile keeps their URLs
+    try:
+        photos = store_photos(data.get('photos', []))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     # Create verification token (expires in 24 hours)
     verification_token = generate_token()
     verification_token_expiry = datetime.utcnow() + timedelta(hours=24)
@@ -50,7 +65,7 @@ def register():
         phone_number=data.get('phone_number'),
         first_name=data['first_name'],
         last_name=data.get('last_name'),
-        date_of_birth=data['date_of_birth'],
+        date_of_birth=date_of_birth,
         gender=data['gender'],
         interested_in=data['interested_in'],
         is_verified=False,
@@ -71,7 +86,7 @@ def register():
         profession=data.get('profession', ''),
         last_active=datetime.utcnow(),
         interests=data.get('interests', []),
-        photos=data.get('photos', [])
+        photos=photos
     )
     
     # Save to database
@@ -92,7 +107,7 @@ def register():
         session['user_id'] = user.id
         
         # Return user data with verification email status
-        user_data = user.to_dict()
+        user_data = serialize(user)
         user_data['verificationEmailSent'] = email_sent
         
         return jsonify(user_data), 201
@@ -127,7 +142,7 @@ def login():
     # Login the user
     session['user_id'] = user.id
     
-    return jsonify(user.to_dict()), 200
+    return jsonify(serialize(user)), 200
 
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
@@ -142,12 +157,12 @@ def get_current_user():
     if not user_id:
         return jsonify({"error": "Not authenticated"}), 401
     
-    user = User.query.get(user_id)
+    user = current_user()
     if not user:
         session.clear()  # Clear invalid session
         return jsonify({"error": "User not found"}), 404
     
-    return jsonify(user.to_dict()), 200
+    return jsonify(serialize(user)), 200
 
 @auth_bp.route('/forgot-password', methods=['POST'])
 def forgot_password():
@@ -266,12 +281,15 @@ def verify_face():
     try:
         db.session.commit()
         
+        # The newly verified user is a new candidate for everyone interested in them
+        ranking_snapshots.invalidate_bucket(user.gender)
+        
         # Log the user in
         session['user_id'] = user.id
         
         return jsonify({
             "message": "Account verified successfully",
-            "user": user.to_dict()
+            "user": serialize(user)
         }), 200
     except Exception as e:
         db.session.rollback()
@@ -286,7 +304,7 @@ def resend_verification():
         return jsonify({"error": "Not authenticated"}), 401
     
     # Get user from database
-    user = User.query.get(user_id)
+    user = current_user()
     if not user:
         return jsonify({"error": "User not found"}), 404
     
@@ -23,19 +23,22 @@ def track_behavior():
     additional_data = data.get('data')
     
     # Track the behavior
-    behavior = track_user_behavior(
-        user_id=user_id,
-        action_type=action_type,
-        target_id=target_id,
-        data=additional_data
-    )
+    try:
+        behavior = track_user_behavior(
+            user_id=user_id,
+            action_type=action_type,
+            target_id=target_id,
+            data=additional_data
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     if not behavior:
         return jsonify({"error": "Failed to track behavior"}), 500
     
     # Special handling for profile views
-    if action_type == 'view_profile' and target_id:
-        track_profile_view(user_id, target_id)
+    if action_type == 'view_profile' and behavior.target_id:
+        track_profile_view(user_id, behavior.target_id)
     
     return jsonify({"success": True, "action": action_type}), 200
 
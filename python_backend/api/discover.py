@@ -3,11 +3,24 @@ from sqlalchemy import func, and_, or_
 from python_backend.models.db import db
 from python_backend.models.models import User, Profile, Like
 from python_backend.utils.auth import login_required
-from python_backend.utils.helpers import calculate_age, calculate_distance
-from python_backend.utils.matching_algorithm import get_user_recommendations
+from python_backend.utils.helpers import (
+    calculate_age, calculate_distance, birth_date_bounds, encode_cursor, decode_cursor, page_size
+)
+from python_backend.utils.matching_algorithm import rank_candidates, load_recommendations
+from python_backend.utils.ranking_cache import ranking_snapshots
+from python_backend.utils.geo import cell_ranges_within_radius, bounding_box
+from python_backend.utils.profile_cards import card_load_options, serialize_card
+from python_backend.utils.serializers import fast_jsonify
+from python_backend.utils.request_cache import current_user, current_profile
 
 discover_bp = Blueprint('discover', __name__, url_prefix='/api/discover')
 
+# Rows fetched per discover round, as a multiple of the page size
+OVERFETCH_FACTOR = 2
+
+# Maximum number of fetch rounds used to fill one discover page
+MAX_FETCH_ROUNDS = 4
+
 @discover_bp.route('', methods=['GET'])
 @login_required
 def get_discover_profiles():
@@ -15,12 +28,12 @@ def get_discover_profiles():
     user_id = session.get('user_id')
     
     # Get the current user to determine preferences
-    user = User.query.get(user_id)
+    user = current_user()
     if not user:
         return jsonify({"error": "User not found"}), 404
     
     # Get user's profile to determine location for distance-based matching
-    user_profile = Profile.query.filter_by(user_id=user_id).first()
+    user_profile = current_profile()
     if not user_profile:
         return jsonify({"error": "User profile not found"}), 404
     
@@ -29,11 +42,22 @@ def get_discover_profiles():
     max_age = request.args.get('maxAge', 100, type=int)
     max_distance = request.args.get('maxDistance', 100, type=int)
     profession = request.args.get('profession')
-    limit = request.args.get('limit', 20, type=int)
+    limit = page_size()
+    
+    # Continue after the last user seen on the previous page
+    last_id = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor)
+        if not position or type(position.get('after')) is not int:
+            return jsonify({"error": "Invalid cursor"}), 400
+        last_id = position['after']
     
     # Build the base query
-    # Join User and Profile
-    query = db.session.query(User, Profile).join(Profile, User.id == Profile.user_id)
+    # Join User and Profile, loading only what the cards show
+    query = db.session.query(User, Profile).join(Profile, User.id == Profile.user_id).options(
+        *card_load_options()
+    )
     
     # Filter by gender preference
     if user.interested_in != 'Both':
@@ -53,48 +77,78 @@ def get_discover_profiles():
     if profession:
         query = query.filter(Profile.profession.ilike(f'%{profession}%'))
     
-    # Get the results
-    results = query.limit(limit).all()
+    # Filter by age using the indexed date of birth
+    earliest_birth_date, latest_birth_date = birth_date_bounds(min_age, max_age)
+    query = query.filter(
+        User.date_of_birth > earliest_birth_date,
+        User.date_of_birth <= latest_birth_date
+    )
     
-    # Process and filter results
+    # Restrict to grid cells and the bounding box that can be within
+    # max_distance; profiles without usable coordinates are kept, as before
+    if user_profile.latitude is not None:
+        cell_ranges = cell_ranges_within_radius(user_profile.latitude, user_profile.longitude, max_distance)
+        box = bounding_box(user_profile.latitude, user_profile.longitude, max_distance)
+        if cell_ranges is not None and box is not None:
+            lat_min, lat_max, lon_ranges = box
+            query = query.filter(or_(
+                Profile.geo_cell.is_(None),
+                and_(
+                    or_(*[Profile.geo_cell.between(first, last) for first, last in cell_ranges]),
+                    Profile.latitude.between(lat_min, lat_max),
+                    or_(*[Profile.longitude.between(low, high) for low, high in lon_ranges])
+                )
+            ))
+    
+    # Fetch in user id order until the page is full. Rows in the bounding
+    # box corners fail the exact distance check, so each round over-fetches
+    # and the number of rounds is capped to keep the request bounded
     profiles = []
+    exhausted = False
+    batch_size = limit * OVERFETCH_FACTOR
     
-    for user_obj, profile in results:
-        user_dict = user_obj.to_dict()
-        profile_dict = profile.to_dict()
-        
-        # Calculate age from date of birth
-        age = calculate_age(user_dict['date_of_birth'])
+    for _ in range(MAX_FETCH_ROUNDS):
+        results = query.filter(User.id > last_id).order_by(User.id).limit(batch_size).all()
         
-        # Skip if age doesn't match filter criteria
-        if age < min_age or age > max_age:
-            continue
-        
-        # Calculate distance if coordinates are available
-        distance = None
-        if user_profile.coordinates and profile.coordinates:
-            try:
-                user_coords = user_profile.coordinates.split(',')
-                profile_coords = profile.coordinates.split(',')
-                if len(user_coords) == 2 and len(profile_coords) == 2:
-                    user_lat, user_lon = user_coords
-                    profile_lat, profile_lon = profile_coords
-                    distance = calculate_distance(user_lat, user_lon, profile_lat, profile_lon)
-                    
-                    # Skip if distance is greater than max_distance
-                    if distance > max_distance:
-                        continue
-            except Exception:
-                pass
+        consumed = 0
+        for user_obj, profile in results:
+            if len(profiles) >= limit:
+                break
+            
+            # Every row looked at moves the keyset position forward
+            consumed += 1
+            last_id = user_obj.id
+            
+            # Calculate distance if coordinates are available
+            distance = None
+            if user_profile.latitude is not None and profile.latitude is not None:
+                distance = calculate_distance(
+                    user_profile.latitude, user_profile.longitude,
+                    profile.latitude, profile.longitude
+                )
+                
+                # Skip if distance is greater than max_distance
+                if distance > max_distance:
+                    continue
+            
+            # Combine user and profile data
+            combined_data = serialize_card(user_obj, profile, age=calculate_age(user_obj.date_of_birth))
+            if distance is not None:
+                combined_data['distance'] = distance
+            
+            profiles.append(combined_data)
         
-        # Combine user and profile data
-        combined_data = {**user_dict, **profile_dict, 'age': age}
-        if distance is not None:
-            combined_data['distance'] = distance
+        # Stop once the page is full or there are no more candidates
+        exhausted = len(results) < batch_size and consumed == len(results)
+        if len(profiles) >= limit or exhausted:
+            break
         
-        profiles.append(combined_data)
+        batch_size *= 2
     
-    return jsonify(profiles), 200
+    response = fast_jsonify(profiles)
+    if not exhausted:
+        response.headers['X-Next-Cursor'] = encode_cursor(after=last_id)
+    return response, 200
 
 @discover_bp.route('/recommendations', methods=['GET'])
 @login_required
@@ -104,49 +158,41 @@ def get_recommendations():
     
     # Get query parameters
     min_score = request.args.get('minScore', 50, type=int)
-    limit = request.args.get('limit', 20, type=int)
-    
-    # Use the advanced matching algorithm
-    recommendations = get_user_recommendations(
-        user_id=user_id,
-        db_session=db.session,
-        limit=limit,
-        min_score=min_score
-    )
-    
-    # Process recommendations
-    result = []
-    for rec in recommendations:
-        user_data = rec['user']
-        profile_data = rec['profile']
-        
-        # Add age
-        age = calculate_age(user_data['date_of_birth'])
-        
-        # Create combined data object
-        combined_data = {
-            **user_data, 
-            **profile_data,
-            'age': age,
-            'compatibility_score': rec['compatibility_score']
-        }
-        
-        # Calculate distance if coordinates are available
-        user_profile = Profile.query.filter_by(user_id=user_id).first()
-        if user_profile and user_profile.coordinates and profile_data.get('coordinates'):
-            try:
-                user_coords = user_profile.coordinates.split(',')
-                profile_coords = profile_data['coordinates'].split(',')
-                
-                if len(user_coords) == 2 and len(profile_coords) == 2:
-                    user_lat, user_lon = user_coords
-                    profile_lat, profile_lon = profile_coords
-                    
-                    distance = calculate_distance(user_lat, user_lon, profile_lat, profile_lon)
-                    combined_data['distance'] = distance
-            except Exception:
-                pass
-        
-        result.append(combined_data)
-    
-    return jsonify(result), 200
\ No newline at end of file
+    limit = page_size()
+    
+    # Later pages read from the ranking snapshot taken for the first page
+    snapshot = None
+    offset = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor)
+        if not position or type(position.get('offset')) is not int or position['offset'] < 0:
+            return jsonify({"error": "Invalid cursor"}), 400
+        snapshot = ranking_snapshots.get(position.get('snapshot'), user_id)
+        offset = position['offset']
+    
+    # First pages reuse the cached ranking until something invalidates it
+    if snapshot is None:
+        snapshot = ranking_snapshots.latest(user_id, min_score)
+    
+    # Rank the candidate pool once and keep it for the following pages
+    if snapshot is None:
+        user = current_user()
+        interested_in = user.interested_in if user else None
+        token = ranking_snapshots.start_ranking(user_id, interested_in)
+        ranking = rank_candidates(
+            user_id=user_id,
+            db_session=db.session,
+            min_score=min_score,
+            user=user,
+            user_profile=current_profile()
+        )
+        snapshot = ranking_snapshots.save(user_id, ranking, min_score, interested_in, token=token)
+    
+    page = snapshot.ranking[offset:offset + limit]
+    result = load_recommendations(page, db.session, current_profile())
+    
+    response = fast_jsonify(result)
+    if offset + len(page) < len(snapshot.ranking):
+        response.headers['X-Next-Cursor'] = encode_cursor(snapshot=snapshot.id, offset=offset + len(page))
+    return response, 200
\ No newline at end of file
@@ -3,6 +3,7 @@ from datetime import datetime
 from python_backend.models.db import db
 from python_backend.models.models import User, Like, Match
 from python_backend.utils.auth import login_required
+from python_backend.utils.ranking_cache import ranking_snapshots
 
 likes_bp = Blueprint('likes', __name__, url_prefix='/api/likes')
 
@@ -67,6 +68,9 @@ def create_like():
     try:
         db.session.commit()
         
+        # The liked user drops out of the liker's candidates
+        ranking_snapshots.invalidate(user_id)
+        
         response = {"liked": True, "user_id": liked_id}
         
         if match:
@@ -1,48 +1,66 @@
-from flask import Blueprint, jsonify, session, request
-from sqlalchemy import or_, and_
+import json
+from flask import Blueprint, Response, jsonify, session, request
+from sqlalchemy import or_, and_, case
+from sqlalchemy.orm import load_only
 from datetime import datetime
 from python_backend.models.db import db
 from python_backend.models.models import User, Profile, Match, Message
 from python_backend.utils.auth import login_required
+from python_backend.utils.helpers import (
+    encode_sync_token, decode_sync_token, encode_sync_continuation, decode_sync_continuation, page_size
+)
+from python_backend.utils.pubsub import get_broker, match_channel
+from python_backend.utils.serializers import fast_jsonify
 
 matches_bp = Blueprint('matches', __name__, url_prefix='/api/matches')
 
+# Seconds between keep-alive comments on an idle message stream
+STREAM_KEEPALIVE = 25
+
 @matches_bp.route('', methods=['GET'])
 @login_required
 def get_matches():
-    """Get all matches for the current user"""
+    """Get all matches for the current user, or only those changed since a sync token"""
     user_id = session.get('user_id')
     
-    # Find all matches where the current user is involved
-    matches = Match.query.filter(
+    # Issue the next sync token before reading so nothing falls in between
+    sync_token = encode_sync_token()
+    since = None
+    if request.args.get('since'):
+        since = decode_sync_token(request.args['since'])
+        if not since:
+            return jsonify({"error": "Invalid sync token"}), 400
+    
+    # Load the matches together with the other user, their profile and the
+    # last message, all read from the per-match summary. Only the columns
+    # the match list shows are loaded from the user and profile rows
+    other_user_id = case((Match.user1_id == user_id, Match.user2_id), else_=Match.user1_id)
+    query = db.session.query(Match, User, Profile, Message).options(
+        load_only(User.username, User.first_name, User.last_name),
+        load_only(Profile.photos, Profile.profession, Profile.last_active)
+    ).join(
+        User, User.id == other_user_id
+    ).join(
+        Profile, Profile.user_id == User.id
+    ).outerjoin(
+        Message, Message.id == Match.last_message_id
+    ).filter(
         or_(
             Match.user1_id == user_id,
             Match.user2_id == user_id
         )
-    ).order_by(Match.matched_at.desc()).all()
+    )
+    
+    # Delta sync: only matches created or changed after the token
+    if since:
+        query = query.filter(Match.updated_at > since)
+    
+    matches = query.order_by(Match.matched_at.desc()).all()
     
     match_list = []
     
-    for match in matches:
-        # Determine the other user in the match
-        other_user_id = match.user2_id if match.user1_id == user_id else match.user1_id
-        
-        # Get the other user's information
-        other_user = User.query.get(other_user_id)
-        profile = Profile.query.filter_by(user_id=other_user_id).first()
-        
-        if not other_user or not profile:
-            continue
-        
-        # Get the last message in this match
-        last_message = Message.query.filter_by(match_id=match.id).order_by(Message.sent_at.desc()).first()
-        
-        # Count unread messages
-        unread_count = Message.query.filter_by(
-            match_id=match.id,
-            receiver_id=user_id,
-            is_read=False
-        ).count()
+    for match, other_user, profile, last_message in matches:
+        unread_count = match.unread_count_for(user_id)
         
         # Create match data
         match_data = {
@@ -67,20 +85,42 @@ def get_matches():
                 'id': last_message.id,
                 'content': last_message.content,
                 'sent_at': last_message.sent_at.isoformat(),
-                'is_read': last_message.is_read,
+                'is_read': match.is_read(last_message),
                 'sender_id': last_message.sender_id
             }
         
         match_list.append(match_data)
     
-    return jsonify(match_list), 200
+    if since:
+        return fast_jsonify({"items": match_list, "sync_token": sync_token}), 200
+    
+    response = fast_jsonify(match_list)
+    response.headers['X-Sync-Token'] = sync_token
+    return response, 200
 
 @matches_bp.route('/<int:match_id>/messages', methods=['GET'])
 @login_required
 def get_messages(match_id):
-    """Get messages for a match"""
+    """Get messages for a match, or only the changes since a sync token"""
     user_id = session.get('user_id')
     
+    # Issue the next sync token before reading so nothing falls in between
+    sync_token = encode_sync_token()
+    since = None
+    if request.args.get('since'):
+        position = decode_sync_continuation(request.args['since'])
+        if not position:
+            return jsonify({"error": "Invalid sync token"}), 400
+        since, since_id = position
+    
+    # Get query parameters
+    page = request.args.get('page', 1, type=int)
+    limit = page_size()
+    before = request.args.get('before', type=int)
+    after = request.args.get('after', type=int)
+    if before and after:
+        return jsonify({"error": "Use either before or after, not both"}), 400
+    
     # Ensure the match exists and the user is part of it
     match = Match.query.filter(
         and_(
@@ -95,27 +135,56 @@ def get_messages(match_id):
     if not match:
         return jsonify({"error": "Match not found"}), 404
     
-    # Get query parameters
-    page = request.args.get('page', 1, type=int)
-    limit = request.args.get('limit', 20, type=int)
-    
-    # Calculate offset
-    offset = (page - 1) * limit
-    
-    # Get messages
-    messages = Message.query.filter_by(match_id=match_id).order_by(Message.sent_at.desc()).offset(offset).limit(limit).all()
-    
-    # Mark all unread messages as read
-    unread_messages = Message.query.filter_by(
-        match_id=match_id,
-        receiver_id=user_id,
-        is_read=False
-    ).all()
-    
-    for msg in unread_messages:
-        msg.is_read = True
+    # Mark everything as read by moving the reader's watermark, skipping the
+    # write when there is nothing new
+    if match.mark_read(user_id):
+        db.session.commit()
     
-    db.session.commit()
+    # Get messages, newest first
+    query = Message.query.filter_by(match_id=match_id)
+    has_more = False
+    if since:
+        # Delta sync: messages sent after the token, oldest first so a
+        # truncated delta can resume where it stopped
+        if since_id is None:
+            query = query.filter(Message.sent_at > since)
+        else:
+            query = query.filter(or_(
+                Message.sent_at > since,
+                and_(Message.sent_at == since, Message.id > since_id)
+            ))
+        messages = query.order_by(Message.sent_at.asc(), Message.id.asc()).limit(limit + 1).all()
+        
+        # More than a page: the next sync resumes after the last message sent
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if has_more and messages:
+            sync_token = encode_sync_continuation(messages[-1].sent_at, messages[-1].id)
+        messages = messages[::-1]
+    elif before or after:
+        # Keyset pages relative to a message of this conversation
+        anchor = Message.query.filter_by(id=before or after, match_id=match_id).first()
+        if not anchor:
+            return jsonify({"error": "Invalid cursor"}), 400
+        
+        if before:
+            # Messages older than the anchor
+            query = query.filter(or_(
+                Message.sent_at < anchor.sent_at,
+                and_(Message.sent_at == anchor.sent_at, Message.id < anchor.id)
+            )).order_by(Message.sent_at.desc(), Message.id.desc())
+            messages = query.limit(limit).all()
+        else:
+            # Messages newer than the anchor, closest first
+            query = query.filter(or_(
+                Message.sent_at > anchor.sent_at,
+                and_(Message.sent_at == anchor.sent_at, Message.id > anchor.id)
+            )).order_by(Message.sent_at.asc(), Message.id.asc())
+            messages = query.limit(limit).all()[::-1]
+    else:
+        # Calculate offset
+        offset = (page - 1) * limit
+        messages = query.order_by(Message.sent_at.desc(), Message.id.desc()).offset(offset).limit(limit).all()
     
     # Format messages
     message_list = []
@@ -127,10 +196,24 @@ def get_messages(match_id):
             'receiver_id': message.receiver_id,
             'content': message.content,
             'sent_at': message.sent_at.isoformat(),
-            'is_read': message.is_read
+            'is_read': match.is_read(message)
         })
     
-    return jsonify(message_list), 200
+    if since:
+        # Read watermarks let the client update is_read on messages it already has
+        return fast_jsonify({
+            "items": message_list,
+            "has_more": has_more,
+            "read_up_to": {
+                str(match.user1_id): match.last_read_id_for(match.user1_id),
+                str(match.user2_id): match.last_read_id_for(match.user2_id)
+            },
+            "sync_token": sync_token
+        }), 200
+    
+    response = fast_jsonify(message_list)
+    response.headers['X-Sync-Token'] = sync_token
+    return response, 200
 
 @matches_bp.route('/<int:match_id>/messages', methods=['POST'])
 @login_required
@@ -172,9 +255,21 @@ def create_message(match_id):
     db.session.add(message)
     
     try:
+        # Update the conversation summary in the same transaction
+        db.session.flush()
+        match.last_message_id = message.id
+        match.last_message_at = message.sent_at
+        if match.user1_id == receiver_id:
+            match.user1_unread_count = Match.user1_unread_count + 1
+        else:
+            match.user2_unread_count = Match.user2_unread_count + 1
+        
+        # Replying means the sender has read the conversation up to here
+        match.mark_read(user_id, up_to=message.id)
+        
         db.session.commit()
         
-        return jsonify({
+        message_data = {
             'id': message.id,
             'match_id': message.match_id,
             'sender_id': message.sender_id,
@@ -182,7 +277,52 @@ def create_message(match_id):
             'content': message.content,
             'sent_at': message.sent_at.isoformat(),
             'is_read': message.is_read
-        }), 201
+        }
+        
+        # Push the message to open conversation streams
+        get_broker().publish(match_channel(match_id), message_data)
+        
+        return jsonify(message_data), 201
     except Exception as e:
         db.session.rollback()
-        return jsonify({"error": "Failed to send message", "details": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "Failed to send message", "details": str(e)}), 500
+
+@matches_bp.route('/<int:match_id>/messages/stream', methods=['GET'])
+@login_required
+def stream_messages(match_id):
+    """Stream new messages in a match as Server-Sent Events"""
+    user_id = session.get('user_id')
+    
+    # Ensure the match exists and the user is part of it
+    match = Match.query.filter(
+        and_(
+            Match.id == match_id,
+            or_(
+                Match.user1_id == user_id,
+                Match.user2_id == user_id
+            )
+        )
+    ).first()
+    
+    if not match:
+        return jsonify({"error": "Match not found"}), 404
+    
+    subscription = get_broker().subscribe(match_channel(match_id))
+    
+    def events():
+        # The stream holds no database resources; it waits on the broker only
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                message = subscription.get(timeout=STREAM_KEEPALIVE)
+                if message is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"id: {message['id']}\nevent: message\ndata: {json.dumps(message)}\n\n"
+        finally:
+            subscription.close()
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -0,0 +1,68 @@
+import os
+from flask import Blueprint, jsonify, request, send_file
+from python_backend.utils.auth import login_required
+from python_backend.utils.photo_store import (
+    save_photo,
+    photo_path,
+    variant_path,
+    photo_url,
+    image_type,
+    is_photo_hash,
+    PHOTO_SIZES
+)
+
+photos_bp = Blueprint('photos', __name__, url_prefix='/api/photos')
+
+# Photo URLs are content addressed, so responses never go stale
+PHOTO_MAX_AGE = 365 * 24 * 60 * 60
+
+@photos_bp.route('', methods=['POST'])
+@login_required
+def upload_photo():
+    """Store an uploaded photo and return its URL"""
+    photo = request.files.get('photo')
+    if not photo:
+        return jsonify({"error": "Photo file is required"}), 400
+    
+    try:
+        photo_hash = save_photo(photo.read())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({"id": photo_hash, "url": photo_url(photo_hash)}), 201
+
+@photos_bp.route('/<photo_hash>', methods=['GET'])
+@login_required
+def get_photo(photo_hash):
+    """Serve a stored photo, optionally resized (?size=thumb or ?size=card)"""
+    if not is_photo_hash(photo_hash):
+        return jsonify({"error": "Photo not found"}), 404
+    
+    size = request.args.get('size')
+    if size and size not in PHOTO_SIZES:
+        return jsonify({"error": "Invalid photo size"}), 400
+    
+    # Missing variants are generated now; fall back to the original if they can't be
+    path = variant_path(photo_hash, size) if size else None
+    served_size = size if path else None
+    if not path:
+        path = photo_path(photo_hash)
+    if not os.path.exists(path):
+        return jsonify({"error": "Photo not found"}), 404
+    
+    with open(path, 'rb') as photo_file:
+        mimetype = image_type(photo_file.read(12))
+    
+    # A fallback may be replaced by the variant later, so it isn't cached for long
+    response = send_file(
+        os.path.abspath(path),
+        mimetype=mimetype,
+        etag=f"{photo_hash}-{served_size or 'original'}",
+        max_age=PHOTO_MAX_AGE if served_size == size else 0,
+        conditional=True
+    )
+    # Photos are only shown to signed-in users, so keep them out of shared caches
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = served_size == size
+    return response
@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify, session
 from datetime import datetime
 from python_backend.models.db import db
-from python_backend.models.models import User, Profile
 from python_backend.utils.auth import login_required
+from python_backend.utils.ranking_cache import ranking_snapshots
+from python_backend.utils.photo_store import store_photos
+from python_backend.utils.serializers import serialize
+from python_backend.utils.request_cache import current_user, current_profile
 
 profile_bp = Blueprint('profile', __name__, url_prefix='/api/profile')
 
@@ -13,17 +16,17 @@ def get_profile():
     user_id = session.get('user_id')
     
     # Get the user profile
-    profile = Profile.query.filter_by(user_id=user_id).first()
+    profile = current_profile()
     
     if not profile:
         return jsonify({"error": "Profile not found"}), 404
     
     # Get the user to combine data
-    user = User.query.get(user_id)
+    user = current_user()
     
     # Combine user and profile data
-    user_data = user.to_dict()
-    profile_data = profile.to_dict()
+    user_data = serialize(user)
+    profile_data = serialize(profile)
     
     # Update last active time
     profile.last_active = datetime.utcnow()
@@ -42,13 +45,20 @@ def update_profile():
         return jsonify({"error": "No data provided"}), 400
     
     # Get the profile
-    profile = Profile.query.filter_by(user_id=user_id).first()
+    profile = current_profile()
     
     if not profile:
         return jsonify({"error": "Profile not found"}), 404
     
     # Get the user for updating user-specific fields
-    user = User.query.get(user_id)
+    user = current_user()
+    
+    # Inline photos go to the photo store, the profile keeps their URLs
+    if 'photos' in data:
+        try:
+            data['photos'] = store_photos(data['photos'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
     
     # Fields that can be updated on the user model
     user_updatable_fields = [
@@ -61,6 +71,8 @@ def update_profile():
         'profession', 'interests', 'photos'
     ]
     
+    gender = user.gender
+    
     # Update user fields
     for field in user_updatable_fields:
         if field in data:
@@ -77,9 +89,17 @@ def update_profile():
     try:
         db.session.commit()
         
+        # The user's own preferences and profile feed their recommendations
+        ranking_snapshots.invalidate(user_id)
+        
+        # A verified user changing gender leaves one set of preference buckets
+        # and joins another
+        if user.is_verified and user.gender != gender:
+            ranking_snapshots.invalidate_bucket(gender, user.gender)
+        
         # Get updated data
-        user_data = user.to_dict()
-        profile_data = profile.to_dict()
+        user_data = serialize(user)
+        profile_data = serialize(profile)
         
         return jsonify({**user_data, **profile_data}), 200
     except Exception as e:
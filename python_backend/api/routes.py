@@ -5,6 +5,7 @@ from python_backend.api.discover import discover_bp
 from python_backend.api.likes import likes_bp
 from python_backend.api.matches import matches_bp
 from python_backend.api.behavior import behavior_bp
+from python_backend.api.photos import photos_bp
 
 def register_routes(app: Flask):
     """Register all API routes"""
@@ -14,5 +15,6 @@ def register_routes(app: Flask):
     app.register_blueprint(likes_bp)
     app.register_blueprint(matches_bp)
     app.register_blueprint(behavior_bp)
+    app.register_blueprint(photos_bp)
     
     return app
\ No newline at end of file
@@ -4,29 +4,45 @@ from flask_cors import CORS
 from flask_session import Session
 from dotenv import load_dotenv
 from python_backend.models.db import db
+from python_backend.utils.behavior_ingest import behavior_ingest
+from python_backend.utils.behavior_archive import archive_behaviors_command
+from python_backend.utils.query_plans import check_query_plans_command
+from python_backend.utils.request_cache import init_request_cache
+from python_backend.models.migrations import migrate_command
 from python_backend.api.routes import register_routes
 from python_backend.utils.config import SessionConfig
 
 # Load environment variables
 load_dotenv()
 
-def create_app():
-    """Create and configure the Flask application"""
+def create_app(config=None):
+    """Create and configure the Flask application, with optional config overrides"""
     app = Flask(__name__, static_folder=None)
     
     # Configure app
     app.config.from_object(SessionConfig)
+    if config:
+        app.config.update(config)
     
-    # Enable CORS
-    CORS(app, supports_credentials=True, origins=["http://localhost:5000", os.getenv("APP_URL")])
+    # Enable CORS (APP_URL is optional)
+    origins = [origin for origin in ("http://localhost:5000", os.getenv("APP_URL")) if origin]
+    CORS(app, supports_credentials=True, origins=origins,
+         expose_headers=["X-Next-Cursor", "X-Sync-Token", "X-Query-Count"])
     
     # Initialize extensions
     db.init_app(app)
+    behavior_ingest.init_app(app)
+    init_request_cache(app)
     Session(app)
     
     # Register routes
     register_routes(app)
     
+    # Register maintenance commands
+    app.cli.add_command(archive_behaviors_command)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(check_query_plans_command)
+    
     # Serve static files from the client build directory
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
@@ -1,4 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
 
 # Initialize SQLAlchemy
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+def upsert_insert(model):
+    """Get an INSERT for the current database that supports on_conflict_do_update"""
+    insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    return insert(model)
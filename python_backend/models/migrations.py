@@ -0,0 +1,217 @@
+from datetime import date
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, inspect, text, update, Date
+from sqlalchemy.schema import CreateColumn
+from python_backend.models.db import db
+from python_backend.models.models import Match, Profile, ProfileView, SchemaMigration
+from python_backend.utils.geo import parse_coordinates, grid_cell, COORDS_VALID
+from python_backend.utils.helpers import parse_date
+
+# Registered migrations as (version, description, upgrade function)
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """
+    Register an upgrade function as a numbered migration
+
+    Upgrades must be safe to run against a database that already has the
+    change, since new databases get the full schema from db.create_all().
+    """
+    def register(upgrade):
+        MIGRATIONS.append((version, description, upgrade))
+        return upgrade
+    return register
+
+
+def _column_names(table_name):
+    """Get the names of a table's columns as they are in the database"""
+    return {column['name'] for column in inspect(db.session.connection()).get_columns(table_name)}
+
+
+def _add_column(model, name):
+    """Add a model column to its table if the table doesn't have it yet"""
+    table = model.__table__
+    if name in _column_names(table.name):
+        return
+
+    column_ddl = CreateColumn(table.c[name]).compile(dialect=db.engine.dialect)
+    db.session.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+
+def _has_unique(table_name, column_names):
+    """Check whether a table has a unique constraint or index on exactly these columns"""
+    inspector = inspect(db.session.connection())
+    uniques = inspector.get_unique_constraints(table_name) + [
+        index for index in inspector.get_indexes(table_name) if index['unique']
+    ]
+    return any(list(unique['column_names']) == list(column_names) for unique in uniques)
+
+
+def _normalize_birth_dates():
+    """
+    Rewrite legacy date_of_birth strings as ISO dates
+
+    The string column accepted anything strptime('%Y-%m-%d') does, such as
+    '1992-1-5', which neither a Date column nor the Postgres cast reads back.
+
+    Raises:
+        ValueError: Listing the users whose birth dates can't be parsed, so
+            they can be fixed before the migration is run again
+    """
+    rewrites = []
+    unparseable = []
+    for user_id, value in db.session.execute(text("SELECT id, date_of_birth FROM users")):
+        if isinstance(value, date):
+            continue
+        parsed = parse_date(value)
+        if parsed is None:
+            unparseable.append(user_id)
+        elif parsed.isoformat() != value:
+            rewrites.append({'id': user_id, 'date_of_birth': parsed.isoformat()})
+
+    if unparseable:
+        raise ValueError(f"Unparseable date_of_birth for users {', '.join(map(str, unparseable))}")
+    if rewrites:
+        db.session.execute(text("UPDATE users SET date_of_birth = :date_of_birth WHERE id = :id"), rewrites)
+
+
+@migration(1, 'Add location, conversation summary and sync columns')
+def add_catch_up_columns():
+    from python_backend.utils.match_summary import rebuild_match_summaries
+
+    # First, so bad birth dates stop the migration before anything changes
+    columns = inspect(db.session.connection()).get_columns('users')
+    date_of_birth = next(column for column in columns if column['name'] == 'date_of_birth')
+    if db.engine.dialect.name == 'sqlite' or not isinstance(date_of_birth['type'], Date):
+        _normalize_birth_dates()
+
+    for name in ('latitude', 'longitude', 'geo_cell'):
+        _add_column(Profile, name)
+    for name in ('last_message_id', 'last_message_at', 'user1_unread_count', 'user2_unread_count',
+                 'user1_last_read_id', 'user2_last_read_id', 'updated_at'):
+        _add_column(Match, name)
+
+    # date_of_birth used to be a string column. SQLite stores dates as the
+    # same (now normalized) YYYY-MM-DD strings, Postgres needs the column converted.
+    if db.engine.dialect.name == 'postgresql' and not isinstance(date_of_birth['type'], Date):
+        db.session.execute(text(
+            "ALTER TABLE users ALTER COLUMN date_of_birth TYPE DATE USING date_of_birth::date"
+        ))
+    db.session.commit()
+
+    # Parse the numeric location columns out of the coordinate strings
+    locations = []
+    for profile_id, coordinates in db.session.query(Profile.id, Profile.coordinates).filter(
+        Profile.coordinates.isnot(None),
+        Profile.latitude.is_(None)
+    ):
+        state, lat, lon = parse_coordinates(coordinates)
+        if state == COORDS_VALID:
+            locations.append({'id': profile_id, 'latitude': lat, 'longitude': lon, 'geo_cell': grid_cell(lat, lon)})
+    if locations:
+        db.session.execute(update(Profile), locations)
+
+    # Conversation summaries, then a sync timestamp for untouched matches
+    rebuild_match_summaries()
+    Match.query.filter(Match.updated_at.is_(None)).update(
+        {Match.updated_at: func.coalesce(Match.last_message_at, Match.matched_at)},
+        synchronize_session=False
+    )
+
+
+@migration(2, 'Merge duplicate profile views and make (viewer, viewed) unique')
+def unique_profile_views():
+    if _has_unique('profile_views', ('viewer_id', 'viewed_id')):
+        return
+
+    # Keep the oldest row of each pair, carrying the total count and the last view
+    duplicates = db.session.query(
+        ProfileView.viewer_id,
+        ProfileView.viewed_id,
+        func.min(ProfileView.id),
+        func.sum(func.coalesce(ProfileView.view_count, 1)),
+        func.max(ProfileView.last_viewed_at)
+    ).group_by(ProfileView.viewer_id, ProfileView.viewed_id).having(func.count(ProfileView.id) > 1).all()
+
+    for viewer_id, viewed_id, keep_id, view_count, last_viewed_at in duplicates:
+        ProfileView.query.filter_by(id=keep_id).update(
+            {'view_count': view_count, 'last_viewed_at': last_viewed_at}, synchronize_session=False
+        )
+        ProfileView.query.filter(
+            ProfileView.viewer_id == viewer_id,
+            ProfileView.viewed_id == viewed_id,
+            ProfileView.id != keep_id
+        ).delete(synchronize_session=False)
+
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX uq_profile_views_viewer_viewed ON profile_views (viewer_id, viewed_id)"
+    ))
+
+
+@migration(3, 'Add indexes for the hot lookups')
+def add_index_pack():
+    # Every index the models declare, including those added since the
+    # database was created
+    connection = db.session.connection()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+
+@migration(4, 'Backfill activity histograms and behavior rollups')
+def backfill_behavior_features():
+    from python_backend.utils.activity_histogram import rebuild_activity_histograms
+    from python_backend.utils.behavior_rollups import rebuild_behavior_rollups
+
+    rebuild_activity_histograms()
+    rebuild_behavior_rollups()
+
+
+@migration(5, 'Move inline photos to the photo store')
+def move_photos_to_store():
+    from python_backend.utils.photo_store import migrate_inline_photos
+
+    migrate_inline_photos()
+
+
+def run_migrations():
+    """
+    Apply pending migrations in version order
+
+    Each migration is recorded in schema_migrations once it has committed.
+    If one fails the rest are left for the next run. Needs an app context.
+
+    Returns:
+        List of the versions applied
+    """
+    SchemaMigration.__table__.create(bind=db.engine, checkfirst=True)
+    applied = {version for (version,) in db.session.query(SchemaMigration.version)}
+
+    versions = []
+    for version, description, upgrade in sorted(MIGRATIONS, key=lambda entry: entry[0]):
+        if version in applied:
+            continue
+
+        try:
+            upgrade()
+            db.session.add(SchemaMigration(version=version, description=description))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error applying migration {version} ({description}): {e}")
+            break
+
+        versions.append(version)
+
+    return versions
+
+
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    """Create missing tables and apply pending schema migrations"""
+    db.create_all()
+    versions = run_migrations()
+    click.echo(f"Applied migrations: {', '.join(map(str, versions))}" if versions else "Schema is up to date")
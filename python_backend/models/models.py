@@ -1,16 +1,18 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy.orm import relationship, validates
+from sqlalchemy import Column, Integer, String, Text, Boolean, Date, DateTime, ForeignKey, JSON, Float, Index, UniqueConstraint, case, func
 from sqlalchemy.types import TypeDecorator
 from sqlalchemy_serializer import SerializerMixin
 from datetime import datetime
 import json
 
 from python_backend.models.db import db
+from python_backend.utils.geo import parse_coordinates, grid_cell, COORDS_VALID
 
 # Custom JSON List type for storing arrays in SQLite
 class JsonList(TypeDecorator):
     impl = String
+    cache_ok = True  # Stateless, so statements using it can be cached
     
     def process_bind_param(self, value, dialect):
         if value is None:
@@ -26,8 +28,11 @@ class JsonList(TypeDecorator):
 class User(db.Model, SerializerMixin):
     __tablename__ = 'users'
     
-    # Don't include password in serialized output
-    serialize_rules = ('-password',)
+    # Don't include password or relationships in serialized output
+    serialize_rules = (
+        '-password', '-profiles', '-sent_likes', '-received_likes',
+        '-behaviors', '-viewed_profiles', '-profile_viewers'
+    )
     
     id = Column(Integer, primary_key=True)
     username = Column(String(100), unique=True, nullable=False)
@@ -36,11 +41,11 @@ class User(db.Model, SerializerMixin):
     phone_number = Column(String(20), unique=True, nullable=True)
     first_name = Column(String(100), nullable=False)
     last_name = Column(String(100), nullable=True)
-    date_of_birth = Column(String(10), nullable=False)
+    date_of_birth = Column(Date, nullable=False, index=True)
     gender = Column(String(20), nullable=False)
     interested_in = Column(String(20), nullable=False)
     is_verified = Column(Boolean, default=False, nullable=False)
-    verification_token = Column(String(100), nullable=True)
+    verification_token = Column(String(100), nullable=True, index=True)
     verification_token_expiry = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -56,19 +61,35 @@ class User(db.Model, SerializerMixin):
 class Profile(db.Model, SerializerMixin):
     __tablename__ = 'profiles'
     
+    # Don't walk back into the user relationship or expose the grid cell
+    serialize_rules = ('-user', '-geo_cell')
+    
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     bio = Column(Text, nullable=True)
     country = Column(String(100), nullable=True)
     state = Column(String(100), nullable=True)
     city = Column(String(100), nullable=True)
     vicinity = Column(String(100), nullable=True)
     coordinates = Column(String(100), nullable=True)
+    latitude = Column(Float, nullable=True)  # Parsed from coordinates
+    longitude = Column(Float, nullable=True)  # Parsed from coordinates
+    geo_cell = Column(Integer, nullable=True, index=True)  # Grid cell for radius queries
     profession = Column(String(100), default='', nullable=False)
     last_active = Column(DateTime, nullable=True)
     interests = Column(JsonList, default=[], nullable=True)
     photos = Column(JsonList, default=[], nullable=True)
     
+    @validates('coordinates')
+    def validate_coordinates(self, key, coordinates):
+        """Keep the numeric location columns in sync with the "lat,lon" string"""
+        state, lat, lon = parse_coordinates(coordinates)
+        if state == COORDS_VALID:
+            self.latitude, self.longitude, self.geo_cell = lat, lon, grid_cell(lat, lon)
+        else:
+            self.latitude = self.longitude = self.geo_cell = None
+        return coordinates
+    
     def __repr__(self):
         return f"<Profile {self.id} for User {self.user_id}>"
 
@@ -77,14 +98,76 @@ class Match(db.Model, SerializerMixin):
     __tablename__ = 'matches'
     
     id = Column(Integer, primary_key=True)
-    user1_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    user2_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    user1_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    user2_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     matched_at = Column(DateTime, default=datetime.utcnow)
     
+    # Conversation summary, maintained when messages are sent and read
+    last_message_id = Column(Integer, ForeignKey('messages.id', use_alter=True, name='fk_matches_last_message_id'))
+    last_message_at = Column(DateTime)
+    user1_unread_count = Column(Integer, default=0, nullable=False, server_default='0')
+    user2_unread_count = Column(Integer, default=0, nullable=False, server_default='0')
+    
+    # Read watermarks: the last message each participant has read
+    user1_last_read_id = Column(Integer)
+    user2_last_read_id = Column(Integer)
+    
+    # Bumped on every change to the match, for delta sync
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
     # Relationships
     user1 = relationship('User', foreign_keys=[user1_id])
     user2 = relationship('User', foreign_keys=[user2_id])
-    messages = relationship('Message', backref='match', lazy=True)
+    messages = relationship('Message', backref='match', lazy=True, foreign_keys='Message.match_id')
+    
+    def unread_count_for(self, user_id):
+        """Get the number of unread messages for one participant"""
+        return self.user1_unread_count if self.user1_id == user_id else self.user2_unread_count
+    
+    def last_read_id_for(self, user_id):
+        """Get the read watermark of one participant"""
+        return (self.user1_last_read_id if self.user1_id == user_id else self.user2_last_read_id) or 0
+    
+    def is_read(self, message):
+        """Check whether the receiver of a message has read it"""
+        return message.id <= self.last_read_id_for(message.receiver_id)
+    
+    def mark_read(self, user_id, up_to=None):
+        """
+        Advance a participant's read watermark
+        
+        One UPDATE moves the watermark and takes the messages between the
+        stored watermark and the new one off the unread counter. Messages
+        sent meanwhile stay unread, and a concurrent read that got there
+        first leaves nothing to subtract.
+        
+        Args:
+            user_id: Participant who read the messages
+            up_to: Last message read, the last message of the match by default
+            
+        Returns:
+            True if anything changed and needs to be committed
+        """
+        up_to = up_to or self.last_message_id
+        if not up_to or self.last_read_id_for(user_id) >= up_to:
+            return False
+        
+        if self.user1_id == user_id:
+            last_read_column, unread_column = Match.user1_last_read_id, Match.user1_unread_count
+        else:
+            last_read_column, unread_column = Match.user2_last_read_id, Match.user2_unread_count
+        
+        last_read_id = func.coalesce(last_read_column, 0)
+        newly_read = db.select(func.count(Message.id)).where(
+            Message.match_id == Match.id,
+            Message.receiver_id == user_id,
+            Message.id > last_read_id,
+            Message.id <= up_to
+        ).scalar_subquery()
+        
+        setattr(self, last_read_column.key, case((last_read_id > up_to, last_read_column), else_=up_to))
+        setattr(self, unread_column.key, unread_column - newly_read)
+        return True
     
     def __repr__(self):
         return f"<Match {self.id} between Users {self.user1_id} and {self.user2_id}>"
@@ -92,6 +175,10 @@ class Match(db.Model, SerializerMixin):
 # Like model
 class Like(db.Model, SerializerMixin):
     __tablename__ = 'likes'
+    __table_args__ = (
+        # Existing and mutual like lookups
+        Index('ix_likes_liker_liked', 'liker_id', 'liked_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     liker_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -104,6 +191,10 @@ class Like(db.Model, SerializerMixin):
 # Message model
 class Message(db.Model, SerializerMixin):
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Keyset pagination through a conversation
+        Index('ix_messages_match_sent_at_id', 'match_id', 'sent_at', 'id'),
+    )
     
     id = Column(Integer, primary_key=True)
     match_id = Column(Integer, ForeignKey('matches.id'), nullable=False)
@@ -123,6 +214,11 @@ class Message(db.Model, SerializerMixin):
 # UserBehavior model to track user interactions for the recommendation engine
 class UserBehavior(db.Model, SerializerMixin):
     __tablename__ = 'user_behaviors'
+    __table_args__ = (
+        # A user's recent events, and the archive and histogram scans by time
+        Index('ix_user_behaviors_user_created_at', 'user_id', 'created_at'),
+        Index('ix_user_behaviors_created_at', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -141,13 +237,53 @@ class UserBehavior(db.Model, SerializerMixin):
     def __repr__(self):
         return f"<UserBehavior {self.id} by User {self.user_id}: {self.action_type}>"
 
+# UserActivityHistogram model: decayed hour-of-day activity counts per user
+class UserActivityHistogram(db.Model, SerializerMixin):
+    __tablename__ = 'user_activity_histograms'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    hours = Column(JsonList, default=[], nullable=False)  # 24 slots, hour of day (UTC)
+    updated_at = Column(DateTime, nullable=True)  # Time of the most recent recorded activity
+    
+    def __repr__(self):
+        return f"<UserActivityHistogram for User {self.user_id}>"
+
+# Daily behavior counts per user and action, maintained at ingest
+class BehaviorDailyRollup(db.Model, SerializerMixin):
+    __tablename__ = 'behavior_daily_rollups'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC day of the events
+    action_type = Column(String(50), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<BehaviorDailyRollup {self.action_type} x{self.count} by User {self.user_id} on {self.day}>"
+
+# Daily behavior counts per user, target and action, maintained at ingest
+class BehaviorTargetDailyRollup(db.Model, SerializerMixin):
+    __tablename__ = 'behavior_target_daily_rollups'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC day of the events
+    target_id = Column(Integer, primary_key=True)
+    action_type = Column(String(50), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<BehaviorTargetDailyRollup {self.action_type} x{self.count} by User {self.user_id} on {self.target_id}>"
+
 # ProfileView model to track profile views for recommendations
 class ProfileView(db.Model, SerializerMixin):
     __tablename__ = 'profile_views'
+    __table_args__ = (
+        # One counter row per (viewer, viewed) pair, the target of view upserts
+        UniqueConstraint('viewer_id', 'viewed_id', name='uq_profile_views_viewer_viewed'),
+    )
     
     id = Column(Integer, primary_key=True)
     viewer_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    viewed_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    viewed_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     view_count = Column(Integer, default=1)
     last_viewed_at = Column(DateTime, default=datetime.utcnow)
     
@@ -156,4 +292,15 @@ class ProfileView(db.Model, SerializerMixin):
     viewed = relationship('User', foreign_keys=[viewed_id], backref='profile_viewers')
     
     def __repr__(self):
-        return f"<ProfileView {self.id} by User {self.viewer_id} of User {self.viewed_id}>"
\ No newline at end of file
+        return f"<ProfileView {self.id} by User {self.viewer_id} of User {self.viewed_id}>"
+
+# SchemaMigration model: versions applied by the migration runner
+class SchemaMigration(db.Model, SerializerMixin):
+    __tablename__ = 'schema_migrations'
+    
+    version = Column(Integer, primary_key=True)
+    description = Column(String(200), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SchemaMigration {self.version}: {self.description}>"
\ No newline at end of file
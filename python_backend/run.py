@@ -1,12 +1,14 @@
 from python_backend.app import create_app
 import os
 from python_backend.models.db import db
+from python_backend.models.migrations import run_migrations
 
 app = create_app()
 
-# Create database tables if they don't exist
+# Create database tables if they don't exist, then bring existing ones up to date
 with app.app_context():
     db.create_all()
+    run_migrations()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,58 @@
+from datetime import date, datetime
+import pytest
+from python_backend.app import create_app
+from python_backend.models.db import db
+from python_backend.models.models import User, Profile
+from python_backend.utils.ranking_cache import ranking_snapshots
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App on a scratch in-memory database, writing behavior events synchronously"""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'TESTING': True,
+        'QUERY_COUNT_HEADER': True,
+        'SESSION_FILE_DIR': str(tmp_path / 'sessions'),
+        'PHOTO_STORE_DIR': str(tmp_path / 'photos'),
+        'BEHAVIOR_ARCHIVE_DIR': str(tmp_path / 'archive'),
+    })
+    ranking_snapshots.clear()
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def make_user(app):
+    """Create a verified user with a profile"""
+    count = [0]
+
+    def make_user(gender='Female', interested_in='Male', coordinates='30.2672,-97.7431', **profile_fields):
+        count[0] += 1
+        name = f"user{count[0]}"
+        user = User(
+            username=name, email=f"{name}@example.com", password='hash:salt', first_name=name.title(),
+            date_of_birth=date(1990, 1, 1), gender=gender, interested_in=interested_in, is_verified=True
+        )
+        profile_fields.setdefault('interests', ['hiking', 'music'])
+        profile = Profile(user=user, coordinates=coordinates, last_active=datetime.utcnow(), **profile_fields)
+        db.session.add_all([user, profile])
+        db.session.commit()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def login(app):
+    """Get a test client logged in as a user"""
+    def login(user):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user.id
+        return client
+
+    return login
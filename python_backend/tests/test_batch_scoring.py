@@ -0,0 +1,117 @@
+import random
+from datetime import date, datetime, timedelta
+import pytest
+from python_backend.models.db import db
+from python_backend.models.models import (
+    User, Profile, ProfileView, BehaviorTargetDailyRollup, UserActivityHistogram
+)
+from python_backend.utils.batch_scoring import BatchMatchScore, CandidatePool, FACTORS
+from python_backend.utils.behavior_signals import BehaviorSignals
+from python_backend.utils.matching_algorithm import MatchScore
+
+VIEWER_COORDINATES = '30.2672,-97.7431'
+PLACES = [('Austin', 'Texas', 'USA'), ('Dallas', 'Texas', 'USA'), ('Portland', 'Oregon', 'USA'), ('Lyon', None, 'France')]
+INTERESTS = ['hiking', 'music', 'chess', 'cooking', 'travel', 'film']
+PROFESSIONS = ['Software Engineer', 'software engineer', 'Civil Engineer', 'Nurse', 'Teacher']
+
+# Viewers with coordinates, with nothing filled in and with unparseable coordinates
+VIEWERS = [
+    {'coordinates': VIEWER_COORDINATES, 'interests': ['hiking', 'music', 'chess'], 'profession': 'Software Engineer'},
+    {'coordinates': None, 'interests': [], 'profession': None},
+    {'coordinates': 'somewhere', 'interests': ['travel'], 'profession': 'Nurse'},
+]
+
+
+def random_coordinates(rng):
+    """Coordinates covering the missing, unparseable, same-place, nearby and distant branches"""
+    return rng.choice([
+        None, '', 'somewhere', '95.0,10.0', VIEWER_COORDINATES,
+        f"{30.2672 + rng.uniform(-0.05, 0.05):.4f},{-97.7431 + rng.uniform(-0.05, 0.05):.4f}",
+        f"{30.2672 + rng.uniform(-0.8, 0.8):.4f},{-97.7431 + rng.uniform(-0.8, 0.8):.4f}",
+        f"{rng.uniform(-60, 60):.4f},{rng.uniform(-180, 180):.4f}",
+    ])
+
+
+def random_place(rng):
+    """A place, sometimes with missing parts or different capitalization"""
+    city, state, country = rng.choice(PLACES)
+    if rng.random() < 0.3:
+        city, state = city.lower(), state.upper() if state else state
+    if rng.random() < 0.15:
+        city = None
+    return city, state, country
+
+
+def add_user(index, date_of_birth, gender, interested_in, **profile_fields):
+    """Add a verified user with a profile"""
+    user = User(
+        username=f"user{index}", email=f"user{index}@example.com", password='hash:salt', first_name='User',
+        date_of_birth=date_of_birth, gender=gender, interested_in=interested_in, is_verified=True
+    )
+    profile = Profile(user=user, **profile_fields)
+    db.session.add_all([user, profile])
+    return user, profile
+
+
+def add_candidate(rng, index):
+    """Add a candidate with randomized scoring inputs"""
+    city, state, country = random_place(rng)
+    if rng.random() < 0.1:
+        date_of_birth = date(1990, 6, 15)  # The viewer's
+    else:
+        date_of_birth = date(rng.randint(1960, 2005), rng.randint(1, 12), rng.randint(1, 28))
+    last_active = rng.choice([None] + [datetime.utcnow() - timedelta(hours=hours) for hours in (0.5, 5, 100, 500, 2000)])
+
+    return add_user(
+        index, date_of_birth, 'Female', 'Male',
+        coordinates=random_coordinates(rng), city=city, state=state, country=country,
+        interests=rng.choice([None, []] + [rng.sample(INTERESTS, rng.randint(1, 4)) for _ in range(4)]),
+        profession=rng.choice([None, ''] + PROFESSIONS),
+        last_active=last_active
+    )[0]
+
+
+def add_behavior(rng, viewer, candidates):
+    """Add profile views both ways, messages and activity histograms"""
+    for candidate in candidates:
+        if rng.random() < 0.3:
+            db.session.add(ProfileView(viewer_id=viewer.id, viewed_id=candidate.id, view_count=rng.randint(1, 8)))
+        if rng.random() < 0.3:
+            db.session.add(ProfileView(viewer_id=candidate.id, viewed_id=viewer.id, view_count=rng.randint(1, 8)))
+        if rng.random() < 0.2:
+            db.session.add(BehaviorTargetDailyRollup(
+                user_id=viewer.id, day=date.today(), target_id=candidate.id, action_type='send_message', count=1
+            ))
+    for user in [viewer] + candidates:
+        if rng.random() < 0.7:
+            db.session.add(UserActivityHistogram(
+                user_id=user.id, hours=[rng.randint(0, 3) for _ in range(24)], updated_at=datetime.utcnow()
+            ))
+
+
+@pytest.mark.parametrize('viewer_fields', VIEWERS)
+@pytest.mark.parametrize('seed', range(3))
+def test_batch_scores_match_pairwise_scores(app, seed, viewer_fields):
+    rng = random.Random(seed)
+    viewer, viewer_profile = add_user(
+        0, date(1990, 6, 15), 'Male', 'Female', city='Austin', state='Texas', country='USA', **viewer_fields
+    )
+    candidates = [add_candidate(rng, index) for index in range(1, 100)]
+    db.session.flush()
+    add_behavior(rng, viewer, candidates)
+    db.session.commit()
+
+    pool = CandidatePool.from_rows(CandidatePool.query(db.session).filter(User.id != viewer.id).all())
+    pool.load_activity_hours(db.session)
+    scorer = BatchMatchScore(viewer, viewer_profile, pool)
+    signals = BehaviorSignals.prefetch(viewer.id, db.session)
+    totals = scorer.calculate_total_scores(signals)
+    factor_scores = {**scorer.factor_scores, 'behavioral_patterns': scorer.calculate_behavioral_patterns(signals)}
+
+    for index, user_id in enumerate(pool.user_ids.tolist()):
+        target = db.session.get(User, user_id)
+        pair = MatchScore(viewer, viewer_profile, target, Profile.query.filter_by(user_id=user_id).one())
+        for factor in FACTORS:
+            expected = getattr(pair, f"calculate_{factor}")()
+            assert factor_scores[factor][index] == pytest.approx(expected, abs=1e-12), (user_id, factor)
+        assert totals[index] == pair.calculate_total_score(), user_id
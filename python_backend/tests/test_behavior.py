@@ -0,0 +1,89 @@
+from datetime import datetime
+import pytest
+from python_backend.models.db import db
+from python_backend.models.models import UserBehavior, ProfileView
+from python_backend.utils import behavior_ingest as behavior_ingest_module
+from python_backend.utils.behavior_ingest import BehaviorIngest
+from python_backend.utils.ranking_cache import ranking_snapshots
+
+
+@pytest.mark.parametrize('body', [
+    {'action_type': None},
+    {'action_type': ''},
+    {'action_type': 'x' * 51},
+    {'action_type': 'view_profile', 'target_id': {'id': 1}},
+    {'action_type': 'view_profile', 'target_id': 'abc'},
+    {'action_type': 'view_profile', 'target_id': True},
+])
+def test_track_rejects_malformed_events(app, make_user, login, body):
+    user = make_user()
+
+    response = login(user).post('/api/behavior/track', json=body)
+
+    assert response.status_code == 400
+    assert UserBehavior.query.count() == 0
+
+
+def test_track_coerces_numeric_target_ids(app, make_user, login):
+    user, target = make_user(), make_user(gender='Male')
+
+    response = login(user).post('/api/behavior/track', json={'action_type': 'like', 'target_id': str(target.id)})
+
+    assert response.status_code == 200
+    assert UserBehavior.query.one().target_id == target.id
+
+
+def test_flush_keeps_the_valid_events_of_a_failed_batch(app, make_user):
+    user = make_user()
+    ingest = BehaviorIngest()
+    ingest.init_app(app)
+
+    events = [
+        {'user_id': user.id, 'action_type': 'login', 'target_id': None, 'data': None, 'created_at': datetime.utcnow()}
+        for _ in range(10)
+    ]
+    # Bypasses submit() validation, like a row the database rejects
+    events.insert(4, {**events[0], 'action_type': None})
+    ingest._buffer.extend(events)
+
+    ingest.flush()
+
+    assert UserBehavior.query.count() == 10
+    assert not ingest._buffer
+
+
+def test_profile_views_survive_a_failed_behavior_write(app, make_user, login, monkeypatch):
+    viewer, viewed = make_user(), make_user(gender='Male')
+
+    def failing_write(events):
+        db.session.rollback()
+        return False
+
+    monkeypatch.setattr(behavior_ingest_module, 'write_behaviors', failing_write)
+    response = login(viewer).post(f"/api/behavior/profile-view/{viewed.id}")
+
+    assert response.status_code == 200
+    assert ProfileView.query.filter_by(viewer_id=viewer.id, viewed_id=viewed.id).one().view_count == 1
+
+
+def test_profile_views_keep_cached_rankings(app, make_user, login):
+    viewer, viewed = make_user(), make_user(gender='Male')
+    snapshots = [ranking_snapshots.save(user.id, [], min_score=50) for user in (viewer, viewed)]
+
+    login(viewer).post(f"/api/behavior/profile-view/{viewed.id}")
+
+    assert [ranking_snapshots.latest(user.id, 50) for user in (viewer, viewed)] == snapshots
+
+
+def test_only_first_messages_drop_the_senders_ranking(app, make_user, login):
+    sender, target = make_user(), make_user(gender='Male')
+    client = login(sender)
+    event = {'action_type': 'send_message', 'target_id': target.id}
+
+    ranking_snapshots.save(sender.id, [], min_score=50)
+    client.post('/api/behavior/track', json=event)
+    assert ranking_snapshots.latest(sender.id, 50) is None
+
+    snapshot = ranking_snapshots.save(sender.id, [], min_score=50)
+    client.post('/api/behavior/track', json=event)
+    assert ranking_snapshots.latest(sender.id, 50) is snapshot
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+import pytest
+from python_backend.models.db import db
+from python_backend.models.models import UserBehavior
+from python_backend.utils import behavior_archive
+from python_backend.utils.behavior_archive import archive_behaviors, read_archived_behaviors
+
+
+def add_events(user):
+    """Record one event from yesterday and one from now"""
+    for created_at in (datetime.utcnow() - timedelta(days=1), datetime.utcnow()):
+        db.session.add(UserBehavior(user_id=user.id, action_type='login', created_at=created_at))
+    db.session.commit()
+
+
+def test_zero_retention_days_keeps_only_today(app, make_user):
+    add_events(make_user())
+
+    assert archive_behaviors(retention_days=0) == 1
+    assert UserBehavior.query.count() == 1
+
+
+def test_negative_retention_days_are_rejected(app, make_user):
+    add_events(make_user())
+
+    with pytest.raises(ValueError):
+        archive_behaviors(retention_days=-1)
+    assert UserBehavior.query.count() == 2
+
+
+@pytest.mark.parametrize('days, exit_code, remaining', [('0', 0, 1), ('-1', 2, 2)])
+def test_archive_command_days(app, make_user, days, exit_code, remaining):
+    add_events(make_user())
+
+    result = app.test_cli_runner().invoke(args=['archive-behaviors', '--days', days])
+
+    assert result.exit_code == exit_code
+    assert UserBehavior.query.count() == remaining
+
+
+@pytest.mark.parametrize('chunk_size', [3, 5, 1000])
+def test_months_are_archived_across_fetch_chunks(app, make_user, monkeypatch, chunk_size):
+    user, target = make_user(), make_user(gender='Male')
+    events = [
+        {
+            'user_id': user.id, 'action_type': 'view_profile' if index % 2 else 'login',
+            'target_id': target.id if index % 2 else None, 'data': {'index': index} if index % 3 else None,
+            'created_at': datetime(2024, 3, 1) + timedelta(days=index, minutes=index)
+        }
+        for index in range(10)
+    ]
+    db.session.add_all(UserBehavior(**event) for event in events)
+    db.session.commit()
+
+    monkeypatch.setattr(behavior_archive, 'FETCH_CHUNK_SIZE', chunk_size)
+    assert archive_behaviors(retention_days=1) == 10
+
+    archived = list(read_archived_behaviors(user_id=user.id))
+    assert [{key: event[key] for key in events[0]} for event in archived] == events
+    assert UserBehavior.query.count() == 0
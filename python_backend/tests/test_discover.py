@@ -0,0 +1,49 @@
+import pytest
+from python_backend.utils.helpers import encode_cursor
+
+
+@pytest.mark.parametrize('query, shown', [
+    ('maxAge=3000', True),
+    ('minAge=-5', True),
+    ('minAge=-99999&maxAge=99999', True),
+    ('minAge=3000&maxAge=3000', False),
+])
+def test_out_of_range_ages_are_clamped(app, make_user, login, query, shown):
+    viewer = make_user(gender='Male', interested_in='Female')
+    candidate = make_user(gender='Female', interested_in='Male')
+
+    response = login(viewer).get(f"/api/discover?{query}")
+
+    assert response.status_code == 200
+    assert [card['user_id'] for card in response.json] == ([candidate.id] if shown else [])
+
+
+@pytest.mark.parametrize('path', ['/api/discover', '/api/discover/recommendations'])
+@pytest.mark.parametrize('position', [{'after': True}, {'offset': True}, {'snapshot': 1, 'offset': False}])
+def test_boolean_cursors_are_rejected(app, make_user, login, path, position):
+    viewer = make_user(gender='Male', interested_in='Female')
+
+    response = login(viewer).get(path, query_string={'cursor': encode_cursor(**position)})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('path', ['/api/discover?limit=0', '/api/discover/recommendations?minScore=0&limit=-1'])
+def test_cursor_pages_advance_with_small_limits(app, make_user, login, path):
+    viewer = make_user(gender='Male', interested_in='Female')
+    candidates = [make_user().id for _ in range(3)]
+    client = login(viewer)
+
+    seen = []
+    response = client.get(path)
+    for _ in range(len(candidates) + 1):
+        assert response.status_code == 200
+        seen.extend(card['user_id'] for card in response.json)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+        response = client.get(f"{path}&cursor={cursor}")
+    else:
+        pytest.fail("Cursor pages never ended")
+
+    assert sorted(seen) == candidates
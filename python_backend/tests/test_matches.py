@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from python_backend.models.db import db
+from python_backend.models.models import Match, Message
+from python_backend.utils.helpers import encode_sync_token
+
+
+def make_matches(user, make_user, login, count):
+    """Match a user with `count` new users, each of whom sends a message"""
+    for _ in range(count):
+        other = make_user(gender='Male', interested_in='Female')
+        match = Match(user1_id=user.id, user2_id=other.id)
+        db.session.add(match)
+        db.session.commit()
+        response = login(other).post(f"/api/matches/{match.id}/messages", json={'content': 'Hi'})
+        assert response.status_code == 201
+
+
+@pytest.mark.parametrize('path', ['/api/matches', '/api/matches?since={token}'])
+def test_match_list_runs_a_constant_number_of_queries(app, make_user, login, path):
+    user = make_user()
+    client = login(user)
+    token = client.get('/api/matches').headers['X-Sync-Token']
+
+    counts = []
+    for count in (1, 10):
+        make_matches(user, make_user, login, count)
+        response = client.get(path.format(token=token))
+        assert response.status_code == 200
+        counts.append(int(response.headers['X-Query-Count']))
+
+    assert counts == [1, 1]
+
+
+def test_match_list_shows_the_other_user_and_last_message(app, make_user, login):
+    user = make_user()
+    make_matches(user, make_user, login, 3)
+
+    matches = login(user).get('/api/matches').json
+
+    assert len(matches) == 3
+    for match in matches:
+        assert match['user']['id'] != user.id
+        assert match['last_message']['content'] == 'Hi'
+        assert match['unread_count'] == 1
+
+
+def test_message_deltas_are_paged(app, make_user, login):
+    user, other = make_user(), make_user(gender='Male')
+    match = Match(user1_id=user.id, user2_id=other.id)
+    db.session.add(match)
+    db.session.commit()
+
+    # Some messages share a timestamp, so pages must resume by id too
+    sent_at = datetime.utcnow() - timedelta(minutes=1)
+    for index in range(25):
+        db.session.add(Message(
+            match_id=match.id, sender_id=other.id, receiver_id=user.id,
+            content=str(index), sent_at=sent_at + timedelta(seconds=index // 4)
+        ))
+    db.session.commit()
+
+    client = login(user)
+    token = encode_sync_token(sent_at - timedelta(hours=1))
+    pages = []
+    while True:
+        response = client.get(f"/api/matches/{match.id}/messages?since={token}&limit=10")
+        assert response.status_code == 200
+        body = response.json
+        pages.append([message['content'] for message in body['items']])
+        token = body['sync_token']
+        if not body['has_more']:
+            break
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert pages[0] == [str(index) for index in range(9, -1, -1)]  # Newest first within a page
+    assert sorted(int(content) for page in pages for content in page) == list(range(25))
+
+    # The final token is a plain one, returning nothing new
+    response = client.get(f"/api/matches/{match.id}/messages?since={token}&limit=10")
+    assert response.json['items'] == [] and not response.json['has_more']
+
+
+def test_replying_marks_the_conversation_read(app, make_user, login):
+    user, other = make_user(), make_user(gender='Male')
+    match = Match(user1_id=user.id, user2_id=other.id)
+    db.session.add(match)
+    db.session.commit()
+    for _ in range(2):
+        login(other).post(f"/api/matches/{match.id}/messages", json={'content': 'Hi'})
+
+    reply = login(user).post(f"/api/matches/{match.id}/messages", json={'content': 'Hello'}).json
+
+    db.session.refresh(match)
+    assert match.last_read_id_for(user.id) == reply['id']
+    assert match.unread_count_for(user.id) == 0
+    assert match.unread_count_for(other.id) == 1
+
+
+def test_messages_sent_while_reading_stay_unread(app, make_user, login):
+    user, other = make_user(), make_user(gender='Male')
+    match = Match(user1_id=user.id, user2_id=other.id)
+    db.session.add(match)
+    db.session.commit()
+    for _ in range(2):
+        login(other).post(f"/api/matches/{match.id}/messages", json={'content': 'Hi'})
+    db.session.refresh(match)
+    read_up_to = match.last_message_id
+
+    # Another message lands after the reader loaded the match
+    message = Message(match_id=match.id, sender_id=other.id, receiver_id=user.id, content='Still there?')
+    db.session.add(message)
+    db.session.flush()
+    db.session.execute(update(Match).where(Match.id == match.id).values(
+        last_message_id=message.id, user1_unread_count=Match.user1_unread_count + 1
+    ).execution_options(synchronize_session=False))
+
+    assert match.mark_read(user.id)
+    db.session.commit()
+
+    assert match.last_read_id_for(user.id) == read_up_to
+    assert match.unread_count_for(user.id) == 1
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_message_deltas_page_at_least_one_message(app, make_user, login, limit):
+    user = make_user()
+    make_matches(user, make_user, login, 1)
+    match = Match.query.one()
+    login(match.user2).post(f"/api/matches/{match.id}/messages", json={'content': 'Again'})
+
+    token = encode_sync_token(datetime.utcnow() - timedelta(hours=1))
+    response = login(user).get(f"/api/matches/{match.id}/messages?since={token}&limit={limit}")
+
+    assert response.status_code == 200
+    assert [message['content'] for message in response.json['items']] == ['Hi']
+    assert response.json['has_more']
+
+
+def test_concurrent_reads_take_messages_off_once(app, make_user, login):
+    user, other = make_user(), make_user(gender='Male')
+    match = Match(user1_id=user.id, user2_id=other.id)
+    db.session.add(match)
+    db.session.commit()
+    for _ in range(2):
+        login(other).post(f"/api/matches/{match.id}/messages", json={'content': 'Hi'})
+    db.session.refresh(match)
+    read_up_to = match.last_message_id
+
+    # Another read got there first, then one more message arrived
+    message = Message(match_id=match.id, sender_id=other.id, receiver_id=user.id, content='Still there?')
+    db.session.add(message)
+    db.session.flush()
+    db.session.execute(update(Match).where(Match.id == match.id).values(
+        last_message_id=message.id, user1_last_read_id=read_up_to, user1_unread_count=1
+    ).execution_options(synchronize_session=False))
+
+    assert match.mark_read(user.id)
+    db.session.commit()
+
+    assert match.last_read_id_for(user.id) == read_up_to
+    assert match.unread_count_for(user.id) == 1
+
+
+def test_message_pages_reject_before_and_after_together(app, make_user, login):
+    user = make_user()
+    make_matches(user, make_user, login, 1)
+    match = Match.query.one()
+    message_id = Message.query.one().id
+
+    response = login(user).get(f"/api/matches/{match.id}/messages?before={message_id}&after={message_id}")
+
+    assert response.status_code == 400
+    db.session.refresh(match)
+    assert match.unread_count_for(user.id) == 1  # Rejected before marking anything read
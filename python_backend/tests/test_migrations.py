@@ -0,0 +1,36 @@
+from sqlalchemy import text
+from python_backend.models.db import db
+from python_backend.models.migrations import MIGRATIONS, run_migrations
+from python_backend.models.models import User
+
+
+def set_legacy_birth_date(user, value):
+    """Store a birth date string the way the old string column allowed"""
+    db.session.execute(text("UPDATE users SET date_of_birth = :value WHERE id = :id"), {'value': value, 'id': user.id})
+    db.session.commit()
+    db.session.expire_all()
+
+
+def test_migrations_normalize_legacy_birth_dates(app, make_user, login):
+    viewer = make_user(gender='Male', interested_in='Female')
+    candidate = make_user()
+    set_legacy_birth_date(candidate, '1992-1-5')
+
+    assert run_migrations() == sorted(version for version, _, _ in MIGRATIONS)
+
+    stored = db.session.execute(text("SELECT date_of_birth FROM users WHERE id = :id"), {'id': candidate.id}).scalar()
+    assert stored == '1992-01-05'
+    response = login(viewer).get('/api/discover')
+    assert response.status_code == 200
+    assert candidate.id in [card['user_id'] for card in response.json]
+
+
+def test_unparseable_birth_dates_stop_the_migration(app, make_user, capsys):
+    user_id = make_user().id
+    set_legacy_birth_date(db.session.get(User, user_id), 'sometime in 1992')
+
+    assert run_migrations() == []
+
+    assert f"users {user_id}" in capsys.readouterr().out
+    stored = db.session.execute(text("SELECT date_of_birth FROM users WHERE id = :id"), {'id': user_id}).scalar()
+    assert stored == 'sometime in 1992'
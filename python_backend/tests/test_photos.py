@@ -0,0 +1,61 @@
+import io
+import os
+import pytest
+from PIL import Image
+from python_backend.utils import photo_store
+from python_backend.utils.photo_store import photo_path, save_photo
+
+
+def make_png(width=1200, height=800):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 40, 40)).save(output, format='PNG')
+    return output.getvalue()
+
+
+def upload(client, data):
+    return client.post('/api/photos', data={'photo': (io.BytesIO(data), 'photo.png')})
+
+
+@pytest.mark.parametrize('size, longest_side', [('thumb', 160), ('card', 640)])
+def test_uploads_are_served_resized(app, make_user, login, size, longest_side):
+    client = login(make_user())
+    url = upload(client, make_png()).json['url']
+
+    response = client.get(f"{url}?size={size}")
+
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert max(Image.open(io.BytesIO(response.data)).size) == longest_side
+    assert response.cache_control.immutable
+
+
+def test_photos_stored_without_variants_get_them(app, make_user, login, monkeypatch):
+    client = login(make_user())
+    data = make_png()
+
+    monkeypatch.setattr(photo_store, 'Image', None)
+    photo_hash = save_photo(data)
+    assert not os.path.exists(photo_path(photo_hash, 'thumb'))
+    monkeypatch.undo()
+
+    # Requested before the photo is uploaded again
+    response = client.get(f"/api/photos/{photo_hash}?size=thumb")
+    assert response.status_code == 200
+    assert max(Image.open(io.BytesIO(response.data)).size) == 160
+
+    # Uploading it again fills in what is still missing
+    os.remove(photo_path(photo_hash, 'card'))
+    assert upload(client, data).status_code == 201
+    assert os.path.exists(photo_path(photo_hash, 'card'))
+
+
+def test_unresizable_photos_fall_back_to_the_original(app, make_user, login, monkeypatch):
+    client = login(make_user())
+    monkeypatch.setattr(photo_store, 'Image', None)
+    url = upload(client, make_png()).json['url']
+
+    response = client.get(f"{url}?size=thumb")
+
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert not response.cache_control.immutable
@@ -0,0 +1,5 @@
+from python_backend.utils.query_plans import check_query_plans
+
+
+def test_every_endpoint_is_checked_without_scans():
+    assert check_query_plans() == []
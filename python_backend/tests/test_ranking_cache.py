@@ -0,0 +1,53 @@
+from python_backend.utils.ranking_cache import RankingSnapshotStore
+
+
+def test_rankings_invalidated_while_computed_are_not_cached():
+    store = RankingSnapshotStore()
+
+    token = store.start_ranking(1, 'Female')
+    store.invalidate(1)
+    snapshot = store.save(1, ['stale'], min_score=50, interested_in='Female', token=token)
+
+    assert store.latest(1, 50) is None
+    assert store.get(snapshot.id, 1) is snapshot  # Still pages for the request that ranked it
+
+
+def test_bucket_invalidations_only_affect_rankings_in_that_bucket():
+    store = RankingSnapshotStore()
+
+    female_token = store.start_ranking(1, 'Female')
+    male_token = store.start_ranking(2, 'Male')
+    both_token = store.start_ranking(3, 'Both')
+    store.invalidate_bucket('Female')
+    store.save(1, [], min_score=50, interested_in='Female', token=female_token)
+    store.save(2, [], min_score=50, interested_in='Male', token=male_token)
+    store.save(3, [], min_score=50, interested_in='Both', token=both_token)
+
+    assert store.latest(1, 50) is None
+    assert store.latest(2, 50) is not None
+    assert store.latest(3, 50) is None
+
+
+def test_rankings_saved_without_invalidation_are_cached():
+    store = RankingSnapshotStore()
+
+    token = store.start_ranking(1, 'Female')
+    store.invalidate(2)
+    snapshot = store.save(1, [], min_score=50, interested_in='Female', token=token)
+
+    assert store.latest(1, 50) is snapshot
+
+
+def test_changing_gender_leaves_the_old_bucket(app, make_user, login):
+    viewer = make_user(gender='Male', interested_in='Female')
+    candidate = make_user(gender='Female', interested_in='Male')
+    client = login(viewer)
+
+    cards = client.get('/api/discover/recommendations?minScore=0').json
+    assert candidate.id in [card['user_id'] for card in cards]
+
+    response = login(candidate).patch('/api/profile', json={'gender': 'Male'})
+    assert response.status_code == 200
+
+    cards = client.get('/api/discover/recommendations?minScore=0').json
+    assert candidate.id not in [card['user_id'] for card in cards]
@@ -0,0 +1,61 @@
+from python_backend.models.db import db
+from python_backend.utils import matching_algorithm
+from python_backend.utils.matching_algorithm import rank_candidates
+from python_backend.utils.ranking_cache import ranking_snapshots
+
+
+def test_ranking_spans_several_chunks(app, make_user, login, monkeypatch):
+    viewer = make_user(gender='Male', interested_in='Female')
+    for index in range(12):
+        make_user(interests=['hiking'] if index % 2 else ['chess'], profession='Engineer' if index % 3 else '')
+
+    single_chunk = [(features.user_id, features.score) for features in rank_candidates(viewer.id, db.session)]
+
+    monkeypatch.setattr(matching_algorithm, 'CANDIDATE_CHUNK_SIZE', 5)
+    chunked = [(features.user_id, features.score) for features in rank_candidates(viewer.id, db.session)]
+    assert chunked == single_chunk
+
+    response = login(viewer).get('/api/discover/recommendations?minScore=0')
+    assert response.status_code == 200
+    assert [card['user_id'] for card in response.json] == [user_id for user_id, _ in single_chunk]
+
+
+def test_ranking_keeps_the_best_across_chunks(app, make_user, monkeypatch):
+    viewer = make_user(gender='Male', interested_in='Female')
+    for index in range(12):
+        make_user(interests=['hiking'] if index % 2 else ['chess'])
+
+    best = rank_candidates(viewer.id, db.session, min_score=0)[:3]
+
+    monkeypatch.setattr(matching_algorithm, 'CANDIDATE_CHUNK_SIZE', 4)
+    chunked = rank_candidates(viewer.id, db.session, min_score=0, depth=3)
+    assert [features.user_id for features in chunked] == [features.user_id for features in best]
+
+
+def test_cached_rankings_show_current_interests(app, make_user, login):
+    viewer = make_user(gender='Male', interested_in='Female')
+    candidate = make_user(interests=['hiking'])
+    client = login(viewer)
+    client.get('/api/discover/recommendations?minScore=0')
+
+    login(candidate).patch('/api/profile', json={'interests': ['chess']})
+
+    cards = client.get('/api/discover/recommendations?minScore=0').json
+    assert cards[0]['user_id'] == candidate.id
+    assert cards[0]['interests'] == ['chess']
+
+
+def test_moving_refreshes_distances_in_cached_rankings(app, make_user, login):
+    viewer = make_user(gender='Male', interested_in='Female', coordinates='30.2672,-97.7431')
+    candidate = make_user(coordinates='30.2672,-97.7431')
+    client = login(viewer)
+    assert client.get('/api/discover/recommendations?minScore=0').json[0]['distance'] == 0
+    snapshot = ranking_snapshots.latest(viewer.id, 0)
+
+    login(candidate).patch('/api/profile', json={'coordinates': '32.7767,-96.7970'})
+
+    # Others moving doesn't throw the ranking away, cards measure afresh
+    assert ranking_snapshots.latest(viewer.id, 0) is snapshot
+    cards = client.get('/api/discover/recommendations?minScore=0').json
+    assert cards[0]['user_id'] == candidate.id
+    assert cards[0]['distance'] > 250
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from python_backend.models.db import db
+from python_backend.models.models import UserBehavior, UserActivityHistogram
+
+# Number of slots in a histogram (hour of day)
+HOURS = 24
+
+# Events lose half their weight every HALF_LIFE, so the histogram mostly
+# reflects the last week of activity
+HALF_LIFE = timedelta(days=3, hours=12)
+
+# Histograms with no activity inside this window are treated as empty
+ACTIVE_WINDOW = timedelta(days=7)
+
+
+def decay_factor(elapsed):
+    """Weight multiplier for data that is `elapsed` old"""
+    if elapsed <= timedelta(0):
+        return 1.0
+    return 0.5 ** (elapsed / HALF_LIFE)
+
+
+def record_activity(user_id, moment=None):
+    """
+    Add one event to a user's activity histogram (without committing)
+
+    Existing slots are decayed to `moment` before the new event is added.
+
+    Args:
+        user_id: The user who was active
+        moment: Time of the activity (defaults to now)
+
+    Returns:
+        The UserActivityHistogram object
+    """
+    moment = moment or datetime.utcnow()
+
+    histogram = db.session.get(UserActivityHistogram, user_id)
+    if not histogram:
+        histogram = UserActivityHistogram(user_id=user_id, hours=[0.0] * HOURS)
+        db.session.add(histogram)
+
+    hours = list(histogram.hours or [0.0] * HOURS)
+    if histogram.updated_at and moment > histogram.updated_at:
+        factor = decay_factor(moment - histogram.updated_at)
+        hours = [round(value * factor, 6) for value in hours]
+
+    hours[moment.hour] += 1
+    histogram.hours = hours
+    histogram.updated_at = max(moment, histogram.updated_at or moment)
+
+    return histogram
+
+
+def is_active(histogram, now=None):
+    """Check whether a histogram has activity inside the active window"""
+    if not histogram or not histogram.updated_at:
+        return False
+    return histogram.updated_at >= (now or datetime.utcnow()) - ACTIVE_WINDOW
+
+
+def activity_overlap(user_hours, target_hours):
+    """
+    Calculate the overlap score (0-1) of two activity histograms
+
+    Both histograms are normalized to distributions and the per-hour
+    minimum is summed, then scaled so that 50% overlap is a full score.
+    """
+    total_user = sum(user_hours)
+    total_target = sum(target_hours)
+    if not total_user or not total_target:
+        return 0.5  # No activity data for comparison
+
+    overlap = 0
+    for hour in range(HOURS):
+        overlap += min(user_hours[hour] / total_user, target_hours[hour] / total_target)
+
+    return min(overlap * 2, 1.0)
+
+
+def rebuild_activity_histograms(days=7):
+    """
+    Rebuild every user's histogram from raw behavior rows
+
+    Used to backfill the feature store for existing databases.
+
+    Args:
+        days: Number of days of raw activity to replay
+
+    Returns:
+        Number of histograms written
+    """
+    since_date = datetime.utcnow() - timedelta(days=days)
+
+    # Replay events in time order per user, decaying between events
+    # exactly like record_activity does
+    histograms = {}
+    behaviors = db.session.query(UserBehavior.user_id, UserBehavior.created_at).filter(
+        UserBehavior.created_at >= since_date
+    ).order_by(UserBehavior.user_id, UserBehavior.created_at).yield_per(1000)
+
+    for user_id, created_at in behaviors:
+        hours, updated_at = histograms.get(user_id, ([0.0] * HOURS, created_at))
+        factor = decay_factor(created_at - updated_at)
+        hours = [value * factor for value in hours]
+        hours[created_at.hour] += 1
+        histograms[user_id] = (hours, created_at)
+
+    for user_id, (hours, updated_at) in histograms.items():
+        db.session.merge(UserActivityHistogram(
+            user_id=user_id,
+            hours=[round(value, 6) for value in hours],
+            updated_at=updated_at
+        ))
+
+    db.session.commit()
+    return len(histograms)
@@ -0,0 +1,579 @@
+import math
+import heapq
+from datetime import datetime, date, timedelta
+import numpy as np
+from python_backend.models.models import User, Profile, UserActivityHistogram
+from python_backend.utils.helpers import calculate_age
+from python_backend.utils.activity_histogram import HOURS, ACTIVE_WINDOW
+from python_backend.utils.geo import COORDS_MISSING, COORDS_INVALID, COORDS_VALID, EARTH_RADIUS_KM
+
+# math.exp is used for the age curve so scores are bit-identical to MatchScore
+_AGE_SCORES = np.array([math.exp(-0.15 * diff) for diff in range(151)])
+
+# Number of set bits for every byte value, used to popcount interest bitsets
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# MatchScore factors, in the order scores are accumulated
+FACTORS = (
+    'age_compatibility', 'location_proximity', 'interests_overlap',
+    'activity_level', 'profession_compatibility', 'behavioral_patterns'
+)
+
+
+def haversine_distances(lat1, lon1, lat2, lon2):
+    """Vectorized helpers.calculate_distance (km, rounded to 2 decimals)"""
+    deg2rad = math.pi / 180
+
+    # Same operation order as the scalar version to keep results identical
+    d_lat = (lat2 - lat1) * deg2rad
+    d_lon = (lon2 - lon1) * deg2rad
+    a = np.sin(d_lat / 2) * np.sin(d_lat / 2) + \
+        np.cos(lat1 * deg2rad) * np.cos(lat2 * deg2rad) * \
+        np.sin(d_lon / 2) * np.sin(d_lon / 2)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return np.round(EARTH_RADIUS_KM * c, 2)
+
+
+def _to_micros(moment):
+    """Convert a naive UTC datetime to integer microseconds since the epoch"""
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def _popcount_rows(bits):
+    """Count the set bits in each row of a (n, words) uint64 array"""
+    if bits.shape[1] == 0:
+        return np.zeros(bits.shape[0], dtype=np.int64)
+    return _POPCOUNT[bits.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+def _positions(ids, keys):
+    """Find each key's row in an unsorted array of unique ids (-1 if absent)"""
+    if len(ids) == 0:
+        return np.full(len(keys), -1, dtype=np.int64)
+
+    order = np.argsort(ids)
+    positions = order[np.clip(np.searchsorted(ids, keys, sorter=order), 0, len(ids) - 1)]
+    return np.where(ids[positions] == keys, positions, -1)
+
+
+def _lookup(ids, mapping):
+    """Gather mapping[id] for every id in an array, plus a mask of which were found"""
+    values = np.zeros(len(ids), dtype=np.int64)
+    found = np.zeros(len(ids), dtype=bool)
+    if not mapping:
+        return values, found
+
+    rows = _positions(ids, np.fromiter(mapping.keys(), dtype=np.int64, count=len(mapping)))
+    mapped = np.fromiter((v or 0 for v in mapping.values()), dtype=np.int64, count=len(mapping))
+    values[rows[rows >= 0]] = mapped[rows >= 0]
+    found[rows[rows >= 0]] = True
+    return values, found
+
+
+def _ages(dates_of_birth, today):
+    """Vectorized calculate_age; unknown ages are returned as -1"""
+    n = len(dates_of_birth)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    try:
+        dobs = np.array(dates_of_birth, dtype='datetime64[D]')
+        # datetime64 accepts more formats than strptime, so only trust strict ISO strings
+        if not all(isinstance(d, date) or len(d) == 10 for d in dates_of_birth):
+            raise ValueError('non-canonical date of birth')
+    except (TypeError, ValueError):
+        return np.array([
+            age if age is not None else -1
+            for age in (calculate_age(d) for d in dates_of_birth)
+        ], dtype=np.int64)
+
+    years = dobs.astype('datetime64[Y]').astype(np.int64) + 1970
+    months = dobs.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    days = (dobs - dobs.astype('datetime64[M]')).astype(np.int64) + 1
+
+    # Subtract a year if the birthday hasn't occurred yet this year
+    before_birthday = (today.month < months) | ((today.month == months) & (today.day < days))
+    return today.year - years - before_birthday.astype(np.int64)
+
+
+class _Vocabulary:
+    """Assigns dense integer codes to lower-cased strings (-1 for empty values)"""
+
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, value):
+        if not value:
+            return -1
+        return self.codes.setdefault(value.lower(), len(self.codes))
+
+    def lookup(self, value):
+        if not value:
+            return -1
+        return self.codes.get(value.lower(), -2)
+
+
+class CandidatePool:
+    """
+    Columnar snapshot of a set of candidate users
+
+    Each attribute MatchScore reads is stored as a NumPy array so that every
+    factor can be computed for the whole pool in a handful of array operations.
+    """
+
+    def __init__(self, user_ids, dates_of_birth, coordinates, latitudes, longitudes,
+                 cities, states, countries, interests, professions, last_active):
+        today = date.today()
+
+        self.user_ids = np.array(user_ids, dtype=np.int64)
+        self.ages = _ages(list(dates_of_birth), today)
+
+        # Coordinates, from the numeric columns kept in sync with Profile.coordinates
+        self.latitudes = np.array(latitudes, dtype=np.float64)
+        self.longitudes = np.array(longitudes, dtype=np.float64)
+        self.coord_states = np.where(
+            np.array([bool(c) for c in coordinates], dtype=bool),
+            np.where(np.isnan(self.latitudes), COORDS_INVALID, COORDS_VALID),
+            COORDS_MISSING
+        ).astype(np.int8)
+
+        # Places, used when coordinates are missing
+        self.places = _Vocabulary()
+        self.city_codes = np.array([self.places.encode(c) for c in cities], dtype=np.int64)
+        self.state_codes = np.array([self.places.encode(s) for s in states], dtype=np.int64)
+        self.country_codes = np.array([self.places.encode(c) for c in countries], dtype=np.int64)
+
+        # Interests as bitsets over the pool vocabulary
+        self.interest_vocabulary = {}
+        rows, bits = [], []
+        for row, row_interests in enumerate(interests):
+            for interest in set(row_interests or []):
+                rows.append(row)
+                bits.append(self.interest_vocabulary.setdefault(interest, len(self.interest_vocabulary)))
+
+        words = (len(self.interest_vocabulary) + 63) // 64
+        self.interest_bits = np.zeros((len(self.user_ids), words), dtype=np.uint64)
+        if rows:
+            bits = np.array(bits, dtype=np.uint64)
+            np.bitwise_or.at(
+                self.interest_bits,
+                (np.array(rows), (bits // 64).astype(np.int64)),
+                np.left_shift(np.uint64(1), bits % np.uint64(64))
+            )
+        self.interest_counts = _popcount_rows(self.interest_bits)
+
+        # Professions as token ids into a table of distinct lower-cased professions
+        self.professions = _Vocabulary()
+        self.profession_ids = np.array([self.professions.encode(p) for p in professions], dtype=np.int64)
+
+        # Last activity as epoch microseconds (-1 when unknown)
+        self.last_active = np.array(
+            [_to_micros(moment) if moment else -1 for moment in last_active],
+            dtype=np.int64
+        )
+
+        # Hour-of-day activity histograms, loaded on demand (see load_activity_hours)
+        self.activity_hours = None
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def take(self, indices):
+        """Get a pool holding a subset of the candidates"""
+        pool = object.__new__(CandidatePool)
+        for name, value in vars(self).items():
+            setattr(pool, name, value[indices] if isinstance(value, np.ndarray) else value)
+        return pool
+
+    def load_activity_hours(self, db_session):
+        """Load the candidates' activity histograms (all zeros when inactive)"""
+        self.activity_hours = np.zeros((len(self.user_ids), HOURS))
+        if not len(self.user_ids):
+            return
+
+        since_date = datetime.utcnow() - ACTIVE_WINDOW
+        histograms = db_session.query(UserActivityHistogram.user_id, UserActivityHistogram.hours).filter(
+            UserActivityHistogram.user_id.in_(self.user_ids.tolist()),
+            UserActivityHistogram.updated_at >= since_date
+        ).all()
+
+        positions = _positions(self.user_ids, np.array([user_id for user_id, _ in histograms], dtype=np.int64))
+        for (_, hours), position in zip(histograms, positions):
+            if position >= 0 and hours:
+                self.activity_hours[position] = hours
+
+    @staticmethod
+    def query(db_session):
+        """
+        Base query selecting the (User, Profile) columns a pool is built from
+        """
+        return db_session.query(
+            User.id, User.date_of_birth, Profile.coordinates, Profile.latitude, Profile.longitude,
+            Profile.city, Profile.state, Profile.country, Profile.interests, Profile.profession,
+            Profile.last_active
+        ).join(Profile, User.id == Profile.user_id)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a pool from rows of CandidatePool.query()"""
+        columns = list(zip(*rows)) or [()] * 11
+        return cls(*columns)
+
+
+class CandidateFeatures:
+    """
+    What scoring worked out about one ranked candidate
+
+    Recommendation cards take ages from these instead of recomputing them
+    from the rows.
+    """
+
+    __slots__ = ('user_id', 'score', 'age')
+
+    def __init__(self, user_id, score, age):
+        self.user_id = user_id
+        self.score = score  # Compatibility score (0-100)
+        self.age = age  # None when unknown
+
+
+class TopCandidates:
+    """
+    Bounded selection of the best scored candidates from a stream
+
+    Keeps at most `size` candidates in a min-heap. Higher scores win and
+    ties go to the candidate seen first, which matches a stable sort of
+    the whole stream.
+    """
+
+    def __init__(self, size, min_score=0):
+        self.size = size
+        self.min_score = min_score
+        self._heap = []  # (score, -sequence, user_id, record); the root is the current worst
+        self._seen = 0
+
+    def prune(self, lower, upper):
+        """
+        Find the candidates of a chunk that can still make the cut
+
+        Args:
+            lower: Lowest possible score of each candidate
+            upper: Highest possible score of each candidate
+
+        Returns:
+            Boolean mask of candidates worth scoring exactly
+        """
+        keep = upper >= self.min_score
+        if self.size <= 0:
+            return np.zeros(len(upper), dtype=bool)
+
+        # Ties go to earlier candidates, so a full heap must be beaten outright
+        if len(self._heap) >= self.size:
+            keep &= upper > self._heap[0][0]
+
+        # Anything whose best case is below the k-th best known score can't win
+        known = np.concatenate([
+            np.fromiter((entry[0] for entry in self._heap), dtype=np.int64, count=len(self._heap)),
+            lower[keep]
+        ])
+        if len(known) >= self.size:
+            keep &= upper >= np.partition(known, -self.size)[-self.size]
+
+        return keep
+
+    def offer(self, user_ids, scores, mask=None, describe=None):
+        """
+        Consider a chunk of candidates
+
+        Args:
+            user_ids: Candidate user IDs, in stream order
+            scores: Total score of each candidate
+            mask: Optional boolean mask of the candidates to consider
+            describe: Optional function building the record kept for the
+                candidate at an index, only called for candidates that
+                make the cut when offered
+        """
+        sequences = np.arange(self._seen, self._seen + len(user_ids))
+        self._seen += len(user_ids)
+        if self.size <= 0:
+            return
+
+        # Drop anything that can't make the cut before touching the heap
+        eligible = scores >= self.min_score
+        if mask is not None:
+            eligible &= mask
+        if len(self._heap) >= self.size:
+            eligible &= scores > self._heap[0][0]
+        indices = np.flatnonzero(eligible)
+        indices = indices[np.argsort(-scores[indices], kind='stable')][:self.size]
+
+        for index in indices:
+            entry = (int(scores[index]), -int(sequences[index]), int(user_ids[index]))
+            if len(self._heap) >= self.size and entry <= self._heap[0][:3]:
+                break  # The rest of this chunk scores lower
+
+            # Sequences are unique, so records are never compared
+            entry += (describe(index) if describe else None,)
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            else:
+                heapq.heapreplace(self._heap, entry)
+
+    def ranking(self):
+        """Get the selected (user_id, score) pairs, best first"""
+        return [(user_id, score) for score, _, user_id, _ in sorted(self._heap, reverse=True)]
+
+    def records(self):
+        """Get the records built by `describe` for the selected candidates, best first"""
+        return [record for _, _, _, record in sorted(self._heap, reverse=True)]
+
+
+class BatchMatchScore:
+    """
+    Vectorized equivalent of MatchScore
+
+    Scores one viewer against a whole CandidatePool at once. Every factor
+    reproduces the branches of the corresponding MatchScore method, so the
+    total scores match the per-pair implementation.
+    """
+
+    def __init__(self, user, user_profile, pool):
+        from python_backend.utils.matching_algorithm import MatchScore
+
+        self.weights = MatchScore.WEIGHTS
+        self.user_profile = user_profile
+        self.pool = pool
+        self.user_age = calculate_age(user.date_of_birth)
+        self.factor_scores = {}  # Factor name: scores, filled by calculate_base_scores
+
+    def calculate_total_scores(self, signals):
+        """Calculate total compatibility scores (0-100) for every candidate"""
+        return self.combine_scores(self.calculate_base_scores(), self.calculate_behavioral_patterns(signals))
+
+    def calculate_base_scores(self):
+        """Calculate the weighted sum of every factor except behavioral patterns"""
+        factors = self.factor_scores
+        factors['age_compatibility'] = self.calculate_age_compatibility()
+        factors['location_proximity'] = self.calculate_location_proximity()
+        factors['interests_overlap'] = self.calculate_interests_overlap()
+        factors['activity_level'] = self.calculate_activity_level()
+        factors['profession_compatibility'] = self.calculate_profession_compatibility()
+
+        # Accumulate in the same order as MatchScore so float rounding is identical
+        score = self.weights['age_compatibility'] * factors['age_compatibility']
+        for name in FACTORS[1:5]:
+            score = score + self.weights[name] * factors[name]
+        return score
+
+    def combine_scores(self, base_scores, behavioral_scores):
+        """Add behavioral scores to base scores and convert to percentages"""
+        score = base_scores + self.weights['behavioral_patterns'] * behavioral_scores
+
+        # Return as a percentage
+        return np.minimum(np.rint(score * 100), 100).astype(np.int64)
+
+    def calculate_score_bounds(self, base_scores, signals):
+        """
+        Calculate the lowest and highest total score each candidate can reach
+
+        Everything but the activity overlap is known from the viewer's
+        signals alone. The overlap is 0-1 and scoring is monotonic, so the
+        extremes give exact bounds without loading candidate histograms.
+
+        Returns:
+            (lower, upper) arrays of scores (0-100)
+        """
+        view_scores = self._profile_view_scores(signals)
+        messaging_scores = self._messaging_scores(signals)
+        lower = self.combine_scores(base_scores, self._behavioral_scores(view_scores, messaging_scores, 0.0))
+        upper = self.combine_scores(base_scores, self._behavioral_scores(view_scores, messaging_scores, 1.0))
+        return lower, upper
+
+    def candidate_features(self, index, score):
+        """
+        Build the CandidateFeatures of one candidate
+
+        Args:
+            index: The candidate's position in the pool
+            score: The candidate's total score (0-100)
+        """
+        age = int(self.pool.ages[index])
+        return CandidateFeatures(user_id=int(self.pool.user_ids[index]), score=int(score), age=age if age >= 0 else None)
+
+    def calculate_age_compatibility(self):
+        """Calculate age compatibility scores (0-1)"""
+        ages = self.pool.ages
+        scores = np.full(len(ages), 0.5)
+        if self.user_age is None:
+            return scores
+
+        known = ages >= 0
+        diffs = np.minimum(np.abs(ages[known] - self.user_age), len(_AGE_SCORES) - 1)
+        scores[known] = _AGE_SCORES[diffs]
+        return scores
+
+    def calculate_location_proximity(self):
+        """Calculate location proximity scores (0-1)"""
+        pool = self.pool
+        user_lat, user_lon = self.user_profile.latitude, self.user_profile.longitude
+        if not self.user_profile.coordinates:
+            user_state = COORDS_MISSING
+        else:
+            user_state = COORDS_INVALID if user_lat is None else COORDS_VALID
+        scores = np.full(len(pool), 0.5)
+
+        # Either side without coordinates falls back to comparing places
+        missing = pool.coord_states == COORDS_MISSING
+        if user_state == COORDS_MISSING:
+            missing[:] = True
+
+        if missing.any():
+            fallback = np.full(len(pool), 0.20)
+            for codes, value, place_score in (
+                (pool.country_codes, self.user_profile.country, 0.40),
+                (pool.state_codes, self.user_profile.state, 0.60),
+                (pool.city_codes, self.user_profile.city, 0.80),
+            ):
+                code = pool.places.lookup(value)
+                if code >= 0:
+                    fallback[codes == code] = place_score
+            scores[missing] = fallback[missing]
+
+        if user_state != COORDS_VALID:
+            return scores
+
+        valid = pool.coord_states == COORDS_VALID
+        if not valid.any():
+            return scores
+
+        distance = haversine_distances(user_lat, user_lon, pool.latitudes[valid], pool.longitudes[valid])
+
+        scores[valid] = np.select(
+            [distance <= 5, distance <= 20, distance <= 100],
+            [1.0, 0.8 - 0.03 * (distance - 5), 0.5 - 0.003 * (distance - 20)],
+            np.maximum(0.2, 0.3 - 0.001 * (distance - 100))
+        )
+        return scores
+
+    def calculate_interests_overlap(self):
+        """Calculate shared interests scores (0-1)"""
+        pool = self.pool
+        user_interests = set(self.user_profile.interests or [])
+
+        # Viewer bitset over the pool vocabulary; unknown interests can't intersect
+        user_bits = np.zeros(pool.interest_bits.shape[1], dtype=np.uint64)
+        for interest in user_interests:
+            bit = pool.interest_vocabulary.get(interest)
+            if bit is not None:
+                user_bits[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+
+        target_counts = pool.interest_counts
+        intersection = _popcount_rows(pool.interest_bits & user_bits)
+        union = len(user_interests) + target_counts - intersection
+        ratio = intersection / np.maximum(union, 1)
+
+        if not user_interests:
+            return np.where(target_counts == 0, 0.5, 0.3)
+
+        return np.select(
+            [target_counts == 0, intersection == 0, intersection >= 3],
+            [0.3, 0.2, np.minimum(0.7 + ratio * 0.3, 1.0)],
+            0.5 + ratio * 0.3
+        )
+
+    def calculate_activity_level(self, now=None):
+        """Calculate activity level scores (0-1)"""
+        last_active = self.pool.last_active
+        elapsed = _to_micros(now or datetime.utcnow()) - last_active
+        hour = 3600 * 1000000
+
+        return np.select(
+            [last_active < 0, elapsed < hour, elapsed < 24 * hour,
+             elapsed < 7 * 24 * hour, elapsed < 30 * 24 * hour],
+            [0.5, 1.0, 0.9, 0.7, 0.5],
+            0.3
+        )
+
+    def calculate_profession_compatibility(self):
+        """Calculate profession compatibility scores (0-1)"""
+        pool = self.pool
+        user_profession = self.user_profile.profession
+        if not user_profession:
+            return np.full(len(pool), 0.5)
+
+        # Score each distinct profession once, then gather by token id
+        user_profession = user_profession.lower()
+        user_words = set(user_profession.split())
+        table = np.full(len(pool.professions.codes) + 1, 0.5)
+        for profession, code in pool.professions.codes.items():
+            if profession == user_profession:
+                table[code] = 1.0
+            elif user_words.intersection(profession.split()):
+                table[code] = 0.8
+
+        # Code -1 (no profession) maps onto the trailing neutral slot
+        return table[pool.profession_ids]
+
+    def calculate_behavioral_patterns(self, signals):
+        """
+        Calculate behavioral pattern scores (0-1) from prefetched BehaviorSignals
+
+        Requires the pool's activity histograms (see CandidatePool.load_activity_hours).
+        """
+        return self._behavioral_scores(
+            self._profile_view_scores(signals),
+            self._messaging_scores(signals),
+            self._activity_overlap_scores(signals)
+        )
+
+    @staticmethod
+    def _behavioral_scores(view_scores, messaging_scores, overlap_scores):
+        """Weighted sum of the behavioral components"""
+        return view_scores * 0.4 + messaging_scores * 0.4 + overlap_scores * 0.2
+
+    def _profile_view_scores(self, signals):
+        """Score based on profile viewing patterns"""
+        user_ids = self.pool.user_ids
+
+        # Reciprocal interest: the candidate has viewed the viewer's profile
+        counts, found = _lookup(user_ids, signals.views_of_user)
+        scores = np.where(found, 0.4 + np.minimum(counts, 5) / 20, 0.3)
+
+        # The viewer's own views take precedence
+        counts, found = _lookup(user_ids, signals.views_by_user)
+        return np.where(found, 0.5 + np.minimum(counts, 5) / 10, scores)
+
+    def _messaging_scores(self, signals):
+        """Score based on messaging patterns"""
+        messaged = np.isin(self.pool.user_ids, np.fromiter(signals.messaged_ids, dtype=np.int64))
+        return np.where(messaged, 0.9, 0.5)
+
+    def _activity_overlap_scores(self, signals):
+        """Score based on when users are active"""
+        pool = self.pool
+        scores = np.full(len(pool), 0.5)
+
+        user_hours = np.array(signals.user_hours or np.zeros(HOURS), dtype=np.float64)
+        target_hours = pool.activity_hours
+
+        # Sum in slot order, like the scalar activity_overlap
+        total_user = sum(user_hours.tolist())
+        total_target = np.zeros(len(pool))
+        for hour in range(HOURS):
+            total_target = total_target + target_hours[:, hour]
+
+        active = total_target > 0
+        if total_user == 0 or not active.any():
+            return scores
+
+        # Normalize distributions and sum the per-hour minimum in hour order
+        user_hours = user_hours / total_user
+        target_hours = target_hours[active] / total_target[active, None]
+        overlap = np.zeros(len(target_hours))
+        for hour in range(HOURS):
+            overlap = overlap + np.minimum(user_hours[hour], target_hours[:, hour])
+
+        # Scale overlap to 0-1 (higher overlap = higher score)
+        scores[active] = np.minimum(overlap * 2, 1.0)
+        return scores
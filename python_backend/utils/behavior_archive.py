@@ -0,0 +1,224 @@
+import json
+import os
+from datetime import datetime, timedelta
+from itertools import islice
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from python_backend.models.db import db
+from python_backend.models.models import UserBehavior
+
+# Archive files hold one calendar month of behavior events each
+ARCHIVE_PREFIX = 'user_behaviors-'
+ARCHIVE_COLUMNS = ('id', 'user_id', 'action_type', 'target_id', 'created_at', 'data')
+
+# Rows streamed from the hot table per fetch when archiving
+FETCH_CHUNK_SIZE = 1000
+
+# Ids deleted from the hot table per statement and commit
+DELETE_CHUNK_SIZE = 500
+
+
+def archive_path(archive_dir, month):
+    """Get the archive file for a month (a 'YYYY-MM' string)"""
+    return os.path.join(archive_dir, f"{ARCHIVE_PREFIX}{month}.npz")
+
+
+def _next_month(moment):
+    """Get the start of the month after the given moment"""
+    return (moment.replace(day=28) + timedelta(days=4)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def load_archive(path):
+    """
+    Load an archive file's columns
+
+    Args:
+        path: Path of a monthly archive file
+
+    Returns:
+        Dict of column name to numpy array, or None if the file doesn't exist
+    """
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path) as archive:
+        return {column: archive[column] for column in ARCHIVE_COLUMNS}
+
+
+def _merge_archive(path, columns):
+    """
+    Merge columns into an archive file, keeping one row per id
+
+    The file is replaced atomically, so an interrupted run leaves either the
+    old or the new file and archiving the same rows again is harmless.
+    """
+    existing = load_archive(path)
+    if existing is not None:
+        columns = {column: np.concatenate([existing[column], columns[column]]) for column in ARCHIVE_COLUMNS}
+
+    _, unique = np.unique(columns['id'], return_index=True)
+    order = unique[np.lexsort((columns['id'][unique], columns['created_at'][unique]))]
+    columns = {column: values[order] for column, values in columns.items()}
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as archive_file:
+        np.savez_compressed(archive_file, **columns)
+    os.replace(temporary_path, path)
+    return len(order)
+
+
+def _to_columns(rows):
+    """Convert behavior rows into archive column arrays"""
+    return {
+        'id': np.array([row.id for row in rows], dtype=np.int64),
+        'user_id': np.array([row.user_id for row in rows], dtype=np.int64),
+        'action_type': np.array([row.action_type for row in rows], dtype=str),
+        'target_id': np.array([-1 if row.target_id is None else row.target_id for row in rows], dtype=np.int64),
+        'created_at': np.array([row.created_at for row in rows], dtype='datetime64[us]'),
+        'data': np.array([json.dumps(row.data) for row in rows], dtype=str)
+    }
+
+
+def _stream_columns(query):
+    """
+    Stream a query's behavior rows into archive column arrays
+
+    Rows are fetched FETCH_CHUNK_SIZE at a time and converted as they
+    arrive, so a large month is only ever held as compact arrays.
+    """
+    chunks = []
+    rows = iter(query.yield_per(FETCH_CHUNK_SIZE))
+    while True:
+        chunk = list(islice(rows, FETCH_CHUNK_SIZE))
+        chunks.append(_to_columns(chunk))
+        if len(chunk) < FETCH_CHUNK_SIZE:
+            break
+
+    return {column: np.concatenate([chunk[column] for chunk in chunks]) for column in ARCHIVE_COLUMNS}
+
+
+def archive_behaviors(retention_days=None, archive_dir=None):
+    """
+    Move behavior events older than the retention horizon to monthly archives
+
+    Events are written to compressed columnar files (one per calendar month)
+    before being deleted from user_behaviors, so the hot table only ever holds
+    the last retention_days whole days. The daily rollups already count the
+    archived events, so stats and scoring are unaffected. Needs an app context.
+
+    Args:
+        retention_days: Days of events to keep, 0 keeping only today's
+            (defaults to BEHAVIOR_RETENTION_DAYS)
+        archive_dir: Directory for the archive files (defaults to BEHAVIOR_ARCHIVE_DIR)
+
+    Returns:
+        Number of events archived
+
+    Raises:
+        ValueError: If retention_days is negative
+    """
+    if retention_days is None:
+        retention_days = current_app.config['BEHAVIOR_RETENTION_DAYS']
+    if retention_days < 0:
+        raise ValueError("Retention days can't be negative")
+    archive_dir = archive_dir or current_app.config['BEHAVIOR_ARCHIVE_DIR']
+    os.makedirs(archive_dir, exist_ok=True)
+
+    # Cut on a day boundary so the hot table never holds a partial day
+    cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=retention_days), datetime.min.time())
+
+    archived = 0
+    while True:
+        oldest = db.session.query(func.min(UserBehavior.created_at)).filter(
+            UserBehavior.created_at < cutoff
+        ).scalar()
+        if oldest is None:
+            return archived
+
+        month_start = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        month_end = min(_next_month(month_start), cutoff)
+
+        columns = _stream_columns(db.session.query(
+            UserBehavior.id, UserBehavior.user_id, UserBehavior.action_type,
+            UserBehavior.target_id, UserBehavior.created_at, UserBehavior.data
+        ).filter(
+            UserBehavior.created_at >= month_start,
+            UserBehavior.created_at < month_end
+        ).order_by(UserBehavior.id))
+        _merge_archive(archive_path(archive_dir, month_start.strftime('%Y-%m')), columns)
+
+        # Only delete once the archive file is in place
+        ids = columns['id'].tolist()
+        try:
+            for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+                UserBehavior.query.filter(
+                    UserBehavior.id.in_(ids[start:start + DELETE_CHUNK_SIZE])
+                ).delete(synchronize_session=False)
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error deleting archived user behaviors: {e}")
+            return archived
+
+        archived += len(ids)
+
+
+def read_archived_behaviors(user_id=None, start=None, end=None, archive_dir=None):
+    """
+    Read archived behavior events
+
+    Args:
+        user_id: Only return this user's events
+        start: Only return events at or after this time
+        end: Only return events before this time
+        archive_dir: Directory of the archive files (defaults to BEHAVIOR_ARCHIVE_DIR)
+
+    Returns:
+        Generator of dicts of UserBehavior column values, oldest first
+    """
+    archive_dir = archive_dir or current_app.config['BEHAVIOR_ARCHIVE_DIR']
+    if not os.path.isdir(archive_dir):
+        return
+
+    months = sorted(
+        name[len(ARCHIVE_PREFIX):-len('.npz')] for name in os.listdir(archive_dir)
+        if name.startswith(ARCHIVE_PREFIX) and name.endswith('.npz')
+    )
+    for month in months:
+        # Skip whole files outside the requested window
+        if start and month < start.strftime('%Y-%m'):
+            continue
+        if end and month > end.strftime('%Y-%m'):
+            break
+
+        columns = load_archive(archive_path(archive_dir, month))
+        mask = np.ones(len(columns['id']), dtype=bool)
+        if user_id is not None:
+            mask &= columns['user_id'] == user_id
+        if start:
+            mask &= columns['created_at'] >= np.datetime64(start, 'us')
+        if end:
+            mask &= columns['created_at'] < np.datetime64(end, 'us')
+
+        for index in np.flatnonzero(mask):
+            target_id = int(columns['target_id'][index])
+            yield {
+                'id': int(columns['id'][index]),
+                'user_id': int(columns['user_id'][index]),
+                'action_type': str(columns['action_type'][index]),
+                'target_id': None if target_id < 0 else target_id,
+                'created_at': columns['created_at'][index].astype(datetime),
+                'data': json.loads(columns['data'][index])
+            }
+
+
+@click.command('archive-behaviors')
+@click.option('--days', type=click.IntRange(min=0), default=None, help='Days of events to keep in user_behaviors')
+@with_appcontext
+def archive_behaviors_command(days):
+    """Move old behavior events out of user_behaviors into monthly archives"""
+    archived = archive_behaviors(retention_days=days)
+    click.echo(f"Archived {archived} behavior events")
@@ -0,0 +1,251 @@
+import atexit
+import threading
+from collections import deque
+from sqlalchemy import insert
+from python_backend.models.db import db
+from python_backend.models.models import UserBehavior, BehaviorTargetDailyRollup
+from python_backend.utils.activity_histogram import record_activity
+from python_backend.utils.behavior_rollups import add_to_rollups
+from python_backend.utils.ranking_cache import ranking_snapshots
+
+# Behaviors feed the behavioral factor, worth 10% of a compatibility score.
+# Profile views move it by fractions of a point per view, so cached rankings
+# take them in when they expire rather than being dropped on every swipe.
+# Messaging only distinguishes whether the sender ever messaged the target,
+# so a first message is the one behavior that drops the sender's ranking.
+MESSAGE_ACTION = 'send_message'
+
+# Longest action type the column holds
+MAX_ACTION_TYPE_LENGTH = UserBehavior.__table__.c.action_type.type.length
+
+# Largest id an integer column holds
+MAX_ID = 2 ** 63 - 1
+
+
+def _coerce_id(value, name):
+    """Coerce an id given as an integer or a string of digits"""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 < value <= MAX_ID:
+        raise ValueError(f"Invalid {name}")
+    return value
+
+
+def validate_behavior(event):
+    """
+    Check and normalize a behavior event before it is buffered
+
+    A bad event would fail the bulk insert of every event written with it,
+    so events are checked one at a time as they arrive.
+
+    Args:
+        event: Dict of UserBehavior column values
+
+    Returns:
+        The event with its ids coerced to integers
+
+    Raises:
+        ValueError: If a field can't be stored
+    """
+    action_type = event.get('action_type')
+    if not isinstance(action_type, str) or not action_type.strip():
+        raise ValueError("Action type is required")
+    if len(action_type) > MAX_ACTION_TYPE_LENGTH:
+        raise ValueError("Action type is too long")
+
+    target_id = event.get('target_id')
+    return {
+        **event,
+        'user_id': _coerce_id(event.get('user_id'), 'user ID'),
+        'target_id': None if target_id is None else _coerce_id(target_id, 'target ID'),
+    }
+
+
+def _first_messages(events):
+    """Get the (sender, target) pairs of events that are the sender's first message to the target"""
+    pairs = {
+        (event['user_id'], event['target_id'])
+        for event in events if event['action_type'] == MESSAGE_ACTION and event['target_id']
+    }
+    if not pairs:
+        return set()
+
+    messaged = db.session.query(BehaviorTargetDailyRollup.user_id, BehaviorTargetDailyRollup.target_id).filter(
+        BehaviorTargetDailyRollup.user_id.in_({user_id for user_id, _ in pairs}),
+        BehaviorTargetDailyRollup.target_id.in_({target_id for _, target_id in pairs}),
+        BehaviorTargetDailyRollup.action_type == MESSAGE_ACTION
+    ).distinct()
+    return pairs - set(messaged)
+
+
+def write_behaviors(events):
+    """
+    Insert a batch of behavior events in one transaction
+
+    Also keeps the activity histograms and daily rollups in step, and drops
+    the cached rankings of senders messaging someone for the first time.
+    Needs an app context.
+
+    Args:
+        events: List of dicts of UserBehavior column values
+
+    Returns:
+        True if the batch was written
+    """
+    try:
+        first_messages = _first_messages(events)
+        db.session.execute(insert(UserBehavior), events)
+        add_to_rollups(events)
+        for event in sorted(events, key=lambda event: event['created_at']):
+            record_activity(event['user_id'], event['created_at'])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error writing user behaviors: {e}")
+        return False
+
+    for sender_id, _ in first_messages:
+        ranking_snapshots.invalidate(sender_id)
+
+    return True
+
+
+class BehaviorIngest:
+    """
+    Write-behind buffer for behavior events
+
+    Events are appended to a bounded in-memory buffer and written in bulk by
+    a background thread once BEHAVIOR_FLUSH_SIZE events are waiting or every
+    BEHAVIOR_FLUSH_INTERVAL seconds. When the buffer is full the caller
+    flushes it itself, which slows producers down instead of growing memory.
+    Remaining events are flushed at interpreter exit.
+
+    With BEHAVIOR_INGEST_SYNC set (or in testing) every event is written
+    immediately, in the caller's session.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._buffer = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Attach to a Flask app"""
+        app.config.setdefault('BEHAVIOR_INGEST_SYNC', False)
+        app.config.setdefault('BEHAVIOR_BUFFER_SIZE', 10000)
+        app.config.setdefault('BEHAVIOR_FLUSH_SIZE', 500)
+        app.config.setdefault('BEHAVIOR_FLUSH_INTERVAL', 1.0)
+
+        self.app = app
+        app.extensions['behavior_ingest'] = self
+        atexit.register(self.shutdown)
+
+    @property
+    def synchronous(self):
+        """Whether events are written as soon as they are submitted"""
+        return self.app is None or self.app.config['BEHAVIOR_INGEST_SYNC'] or self.app.testing
+
+    def submit(self, event):
+        """
+        Queue a behavior event for writing
+
+        Args:
+            event: Dict of UserBehavior column values
+
+        Returns:
+            True if the event was accepted (or written, in synchronous mode)
+
+        Raises:
+            ValueError: If the event can't be stored (see validate_behavior)
+        """
+        event = validate_behavior(event)
+        if self.synchronous:
+            return write_behaviors([event])
+
+        with self._condition:
+            full = len(self._buffer) >= self.app.config['BEHAVIOR_BUFFER_SIZE']
+            if not full:
+                self._buffer.append(event)
+                if len(self._buffer) >= self.app.config['BEHAVIOR_FLUSH_SIZE']:
+                    self._condition.notify()
+
+        if full:
+            # Backpressure: drain the buffer in the caller's thread
+            self.flush()
+            with self._condition:
+                self._buffer.append(event)
+
+        self._ensure_thread()
+        return True
+
+    def flush(self):
+        """Write every buffered event"""
+        with self._flush_lock:
+            while True:
+                with self._condition:
+                    count = min(len(self._buffer), self.app.config['BEHAVIOR_FLUSH_SIZE'])
+                    batch = [self._buffer.popleft() for _ in range(count)]
+
+                if not batch:
+                    return
+
+                with self.app.app_context():
+                    self._write(batch)
+
+    def _write(self, batch):
+        """
+        Write a batch, splitting it to isolate events the database rejects
+
+        A failed batch is written again in halves, so one bad event only
+        costs itself instead of everything buffered with it.
+        """
+        if write_behaviors(batch) or len(batch) == 1:
+            return
+
+        middle = len(batch) // 2
+        self._write(batch[:middle])
+        self._write(batch[middle:])
+
+    def shutdown(self):
+        """Stop the background thread and flush what is left"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+
+        if self._thread:
+            self._thread.join(timeout=10)
+        if self.app is not None:
+            self.flush()
+
+    def _ensure_thread(self):
+        """Start the background flusher on first use"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._condition:
+            if self._stopping or (self._thread and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name='behavior-ingest', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """Flush on a size or time threshold until shut down"""
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._buffer) < self.app.config['BEHAVIOR_FLUSH_SIZE']:
+                    self._condition.wait(timeout=self.app.config['BEHAVIOR_FLUSH_INTERVAL'])
+                stopping = self._stopping
+
+            self.flush()
+            if stopping:
+                return
+
+
+# Shared ingest pipeline, attached to the app in create_app
+behavior_ingest = BehaviorIngest()
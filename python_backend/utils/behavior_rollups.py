@@ -0,0 +1,87 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from python_backend.models.db import db, upsert_insert
+from python_backend.models.models import UserBehavior, BehaviorDailyRollup, BehaviorTargetDailyRollup
+
+
+def _add_counts(model, keys, counts):
+    """Add counts to rollup rows in one upsert per table"""
+    if not counts:
+        return
+
+    statement = upsert_insert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={'count': model.count + statement.excluded.count}
+    )
+    db.session.execute(statement, [
+        {**dict(zip(keys, key)), 'count': count} for key, count in counts.items()
+    ])
+
+
+def add_to_rollups(events):
+    """
+    Count a batch of behavior events into the daily rollups (without committing)
+
+    Args:
+        events: List of dicts of UserBehavior column values
+    """
+    action_counts = Counter()
+    target_counts = Counter()
+    for event in events:
+        day = event['created_at'].date()
+        action_counts[(event['user_id'], day, event['action_type'])] += 1
+        if event['target_id']:
+            target_counts[(event['user_id'], day, event['target_id'], event['action_type'])] += 1
+
+    _add_counts(BehaviorDailyRollup, ('user_id', 'day', 'action_type'), action_counts)
+    _add_counts(BehaviorTargetDailyRollup, ('user_id', 'day', 'target_id', 'action_type'), target_counts)
+
+
+def rebuild_behavior_rollups():
+    """
+    Rebuild the daily rollups from raw behavior rows
+
+    Used to backfill the rollup tables for existing databases. Days before
+    the oldest event still in user_behaviors have been archived, so their
+    rollups are kept as they are.
+
+    Returns:
+        Number of rollup rows written
+    """
+    day = func.date(UserBehavior.created_at)
+
+    oldest = db.session.query(func.min(UserBehavior.created_at)).scalar()
+    if oldest is None:
+        return 0
+
+    BehaviorDailyRollup.query.filter(BehaviorDailyRollup.day >= oldest.date()).delete()
+    BehaviorTargetDailyRollup.query.filter(BehaviorTargetDailyRollup.day >= oldest.date()).delete()
+
+    rows = 0
+    for user_id, event_day, action_type, count in db.session.query(
+        UserBehavior.user_id, day, UserBehavior.action_type, func.count(UserBehavior.id)
+    ).group_by(UserBehavior.user_id, day, UserBehavior.action_type).yield_per(1000):
+        db.session.add(BehaviorDailyRollup(
+            user_id=user_id, day=_as_date(event_day), action_type=action_type, count=count
+        ))
+        rows += 1
+
+    for user_id, event_day, target_id, action_type, count in db.session.query(
+        UserBehavior.user_id, day, UserBehavior.target_id, UserBehavior.action_type, func.count(UserBehavior.id)
+    ).filter(UserBehavior.target_id.isnot(None)).group_by(
+        UserBehavior.user_id, day, UserBehavior.target_id, UserBehavior.action_type
+    ).yield_per(1000):
+        db.session.add(BehaviorTargetDailyRollup(
+            user_id=user_id, day=_as_date(event_day), target_id=target_id, action_type=action_type, count=count
+        ))
+        rows += 1
+
+    db.session.commit()
+    return rows
+
+
+def _as_date(value):
+    """Normalize a DATE() result (a date, or a string on SQLite)"""
+    return datetime.strptime(value, '%Y-%m-%d').date() if isinstance(value, str) else value
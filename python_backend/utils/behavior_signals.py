@@ -0,0 +1,72 @@
+from datetime import datetime
+from python_backend.models.models import BehaviorTargetDailyRollup, ProfileView, UserActivityHistogram
+from python_backend.utils.activity_histogram import ACTIVE_WINDOW
+
+
+class BehaviorSignals:
+    """
+    Behavioral data for one viewer, shared across all candidates
+
+    Loads the viewer's side of MatchScore.calculate_behavioral_patterns with
+    a fixed number of queries, instead of several queries per pair. The
+    candidates' activity histograms are loaded separately, only for the
+    candidates that need them (see CandidatePool.load_activity_hours).
+    """
+
+    def __init__(self, user_id, views_by_user, views_of_user, messaged_ids, user_hours):
+        self.user_id = user_id
+
+        # {viewed_id: view_count} for profiles the viewer has looked at
+        self.views_by_user = views_by_user
+
+        # {viewer_id: view_count} for users who looked at the viewer
+        self.views_of_user = views_of_user
+
+        # Users the viewer has sent messages to
+        self.messaged_ids = messaged_ids
+
+        # The viewer's hour-of-day histogram (None when inactive)
+        self.user_hours = user_hours
+
+    @classmethod
+    def prefetch(cls, user_id, db_session):
+        """
+        Load behavioral signals for a viewer
+
+        Args:
+            user_id: The viewer's user ID
+            db_session: SQLAlchemy database session
+
+        Returns:
+            BehaviorSignals instance
+        """
+        # Profiles the viewer has viewed, and users who viewed the viewer
+        views_by_user = {}
+        for viewed_id, view_count in db_session.query(
+            ProfileView.viewed_id, ProfileView.view_count
+        ).filter(ProfileView.viewer_id == user_id):
+            views_by_user.setdefault(viewed_id, view_count)
+
+        views_of_user = {}
+        for viewer_id, view_count in db_session.query(
+            ProfileView.viewer_id, ProfileView.view_count
+        ).filter(ProfileView.viewed_id == user_id):
+            views_of_user.setdefault(viewer_id, view_count)
+
+        # Everyone the viewer has messaged, from the daily rollups so that
+        # archived events still count
+        messaged_ids = {
+            target_id for (target_id,) in db_session.query(BehaviorTargetDailyRollup.target_id).filter(
+                BehaviorTargetDailyRollup.user_id == user_id,
+                BehaviorTargetDailyRollup.action_type == 'send_message'
+            ).distinct()
+        }
+
+        # The viewer's activity histogram, if recently active
+        since_date = datetime.utcnow() - ACTIVE_WINDOW
+        user_hours = db_session.query(UserActivityHistogram.hours).filter(
+            UserActivityHistogram.user_id == user_id,
+            UserActivityHistogram.updated_at >= since_date
+        ).scalar()
+
+        return cls(user_id, views_by_user, views_of_user, messaged_ids, user_hours)
@@ -1,6 +1,12 @@
+import atexit
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from python_backend.models.db import db
-from python_backend.models.models import UserBehavior, ProfileView
+from flask import current_app
+from sqlalchemy import func
+from python_backend.models.db import db, upsert_insert
+from python_backend.models.models import UserBehavior, ProfileView, BehaviorDailyRollup, BehaviorTargetDailyRollup
+from python_backend.utils.behavior_ingest import behavior_ingest, validate_behavior
 
 def track_user_behavior(user_id, action_type, target_id=None, data=None):
     """
@@ -13,26 +19,135 @@ def track_user_behavior(user_id, action_type, target_id=None, data=None):
         data: Optional additional data for the action
     
     Returns:
-        The created UserBehavior object
+        The (unsaved) UserBehavior object, or None if it couldn't be recorded
+    
+    Raises:
+        ValueError: If the event can't be stored
     """
     # Create behavior record
-    behavior = UserBehavior(
-        user_id=user_id,
-        action_type=action_type,
-        target_id=target_id,
-        data=data,
-        created_at=datetime.utcnow()
+    event = validate_behavior({
+        'user_id': user_id,
+        'action_type': action_type,
+        'target_id': target_id,
+        'data': data,
+        'created_at': datetime.utcnow()
+    })
+    
+    # Hand the event to the write-behind pipeline, which also keeps the
+    # activity histograms in step
+    if not behavior_ingest.submit(event):
+        return None
+    
+    return UserBehavior(**event)
+
+def upsert_profile_view(viewer_id, viewed_id, increment=1, viewed_at=None):
+    """
+    Add views to a (viewer, viewed) counter in a single statement
+    
+    Uses INSERT ... ON CONFLICT DO UPDATE on the unique (viewer_id, viewed_id)
+    key, so concurrent views of the same profile never lose an increment.
+    
+    Args:
+        viewer_id: ID of the user viewing the profile
+        viewed_id: ID of the user whose profile is being viewed
+        increment: Number of views to add
+        viewed_at: Time of the latest view (defaults to now)
+    
+    Returns:
+        The new view count
+    """
+    statement = upsert_insert(ProfileView).values(
+        viewer_id=viewer_id,
+        viewed_id=viewed_id,
+        view_count=increment,
+        last_viewed_at=viewed_at or datetime.utcnow()
     )
+    statement = statement.on_conflict_do_update(
+        index_elements=['viewer_id', 'viewed_id'],
+        set_={
+            'view_count': func.coalesce(ProfileView.view_count, 0) + statement.excluded.view_count,
+            'last_viewed_at': statement.excluded.last_viewed_at
+        }
+    ).returning(ProfileView.view_count)
     
-    db.session.add(behavior)
+    return db.session.execute(statement).scalar()
+
+class ProfileViewCoalescer:
+    """
+    Merges repeated views of the same profile into one counter increment
     
-    try:
-        db.session.commit()
-        return behavior
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error tracking user behavior: {e}")
-        return None
+    The first view of a pair is written straight away. Further views within
+    the window are only counted in memory, and written as one increment by
+    the next view after the window, by a later call that finds the window
+    expired, or at exit.
+    """
+    
+    def __init__(self):
+        self._pending = OrderedDict()  # {(viewer_id, viewed_id): [view_count, pending, window_start]}
+        self._lock = threading.Lock()
+        self._app = None
+    
+    def add(self, viewer_id, viewed_id, window):
+        """
+        Count a view, writing it now or folding it into the open window
+        
+        Returns:
+            The view count including views not yet written
+        """
+        key = (viewer_id, viewed_id)
+        now = datetime.utcnow()
+        
+        with self._lock:
+            if self._app is None:
+                self._app = current_app._get_current_object()
+                atexit.register(self.flush)
+            
+            entry = self._pending.get(key)
+            if entry and now - entry[2] < window:
+                entry[1] += 1
+                return entry[0] + entry[1]
+            
+            # Start a new window, carrying over views from the previous one
+            increment = 1 + (self._pending.pop(key)[1] if entry else 0)
+            expired = self._pop_expired(now, window)
+        
+        for (expired_viewer_id, expired_viewed_id), (_, pending, start) in expired:
+            upsert_profile_view(expired_viewer_id, expired_viewed_id, pending, start + window)
+        
+        view_count = upsert_profile_view(viewer_id, viewed_id, increment, now)
+        
+        with self._lock:
+            self._pending[key] = [view_count, 0, now]
+        return view_count
+    
+    def flush(self):
+        """Write every pending increment"""
+        with self._lock:
+            entries = [(key, entry) for key, entry in self._pending.items() if entry[1]]
+            self._pending.clear()
+        
+        if not entries or self._app is None:
+            return
+        
+        with self._app.app_context():
+            for (viewer_id, viewed_id), (_, pending, _) in entries:
+                upsert_profile_view(viewer_id, viewed_id, pending)
+            db.session.commit()
+    
+    def _pop_expired(self, now, window):
+        """Remove windows that have closed, returning those with unwritten views"""
+        expired = []
+        while self._pending:
+            key, entry = next(iter(self._pending.items()))
+            if now - entry[2] < window:
+                break
+            self._pending.popitem(last=False)
+            if entry[1]:
+                expired.append((key, entry))
+        return expired
+
+# Shared coalescer, used when PROFILE_VIEW_COALESCE_SECONDS is set
+profile_view_coalescer = ProfileViewCoalescer()
 
 def track_profile_view(viewer_id, viewed_id):
     """
@@ -43,47 +158,37 @@ def track_profile_view(viewer_id, viewed_id):
         viewed_id: ID of the user whose profile is being viewed
     
     Returns:
-        The updated ProfileView object
+        An (unsaved) ProfileView object holding the view count
     """
     # Don't track self-views
     if viewer_id == viewed_id:
         return None
     
-    # Find existing profile view or create new one
-    profile_view = ProfileView.query.filter_by(
-        viewer_id=viewer_id,
-        viewed_id=viewed_id
-    ).first()
-    
-    if profile_view:
-        # Update existing record
-        profile_view.view_count += 1
-        profile_view.last_viewed_at = datetime.utcnow()
-    else:
-        # Create new record
-        profile_view = ProfileView(
-            viewer_id=viewer_id,
-            viewed_id=viewed_id,
-            view_count=1,
-            last_viewed_at=datetime.utcnow()
-        )
-        db.session.add(profile_view)
-    
-    # Also log this as a general behavior
-    track_user_behavior(
-        user_id=viewer_id,
-        action_type='view_profile',
-        target_id=viewed_id,
-        data={'count': profile_view.view_count if profile_view else 1}
-    )
+    window = current_app.config.get('PROFILE_VIEW_COALESCE_SECONDS', 0)
     
     try:
+        # Increment the counter in one round trip
+        if window:
+            view_count = profile_view_coalescer.add(viewer_id, viewed_id, timedelta(seconds=window))
+        else:
+            view_count = upsert_profile_view(viewer_id, viewed_id)
+        
         db.session.commit()
-        return profile_view
     except Exception as e:
         db.session.rollback()
         print(f"Error tracking profile view: {e}")
         return None
+    
+    # Also log this as a general behavior. Only once the view is committed,
+    # since a synchronous ingest commits or rolls back the session itself
+    track_user_behavior(
+        user_id=viewer_id,
+        action_type='view_profile',
+        target_id=viewed_id,
+        data={'count': view_count}
+    )
+    
+    return ProfileView(viewer_id=viewer_id, viewed_id=viewed_id, view_count=view_count)
 
 def get_frequent_profile_views(user_id, limit=10):
     """
@@ -131,53 +236,87 @@ def get_user_behavior_stats(user_id, action_type=None, days=30):
     """
     since_date = datetime.utcnow() - timedelta(days=days)
     
-    # Base query
-    query = UserBehavior.query.filter(
+    # Whole days after the first come from the daily rollups; only the
+    # partial first day is counted from raw events
+    first_full_day = since_date.date() + timedelta(days=1)
+    first_full_day_start = datetime.combine(first_full_day, datetime.min.time())
+    
+    action_query = db.session.query(
+        BehaviorDailyRollup.action_type, func.sum(BehaviorDailyRollup.count)
+    ).filter(
+        BehaviorDailyRollup.user_id == user_id,
+        BehaviorDailyRollup.day >= first_full_day
+    ).group_by(BehaviorDailyRollup.action_type)
+    
+    target_query = db.session.query(
+        BehaviorTargetDailyRollup.target_id, BehaviorTargetDailyRollup.action_type,
+        func.sum(BehaviorTargetDailyRollup.count)
+    ).filter(
+        BehaviorTargetDailyRollup.user_id == user_id,
+        BehaviorTargetDailyRollup.day >= first_full_day
+    ).group_by(BehaviorTargetDailyRollup.target_id, BehaviorTargetDailyRollup.action_type)
+    
+    raw_query = db.session.query(
+        UserBehavior.target_id, UserBehavior.action_type, func.count(UserBehavior.id)
+    ).filter(
+        UserBehavior.user_id == user_id,
+        UserBehavior.created_at >= since_date,
+        UserBehavior.created_at < first_full_day_start
+    ).group_by(UserBehavior.target_id, UserBehavior.action_type)
+    
+    recent_query = UserBehavior.query.filter(
         UserBehavior.user_id == user_id,
         UserBehavior.created_at >= since_date
     )
     
     # Filter by action type if specified
     if action_type:
-        query = query.filter(UserBehavior.action_type == action_type)
-    
-    # Get all matching behaviors
-    behaviors = query.all()
+        action_query = action_query.filter(BehaviorDailyRollup.action_type == action_type)
+        target_query = target_query.filter(BehaviorTargetDailyRollup.action_type == action_type)
+        raw_query = raw_query.filter(UserBehavior.action_type == action_type)
+        recent_query = recent_query.filter(UserBehavior.action_type == action_type)
     
     # Calculate statistics
     stats = {
-        'total_actions': len(behaviors),
+        'total_actions': 0,
         'action_counts': {},
         'target_counts': {},
         'recent_actions': []
     }
     
-    for behavior in behaviors:
+    def count_action(action, count):
         # Count by action type
-        action = behavior.action_type
-        stats['action_counts'][action] = stats['action_counts'].get(action, 0) + 1
-        
-        # Count by target (if applicable)
-        if behavior.target_id:
-            target = behavior.target_id
-            if target not in stats['target_counts']:
-                stats['target_counts'][target] = {
-                    'count': 0,
-                    'actions': {}
-                }
-            stats['target_counts'][target]['count'] += 1
-            
-            # Count by action for each target
-            action_key = behavior.action_type
-            stats['target_counts'][target]['actions'][action_key] = stats['target_counts'][target]['actions'].get(action_key, 0) + 1
-        
-        # Add to recent actions (limit to 10)
-        if len(stats['recent_actions']) < 10:
-            stats['recent_actions'].append({
-                'action': behavior.action_type,
-                'target_id': behavior.target_id,
-                'data': behavior.data,
-                'timestamp': behavior.created_at.isoformat()
-            })
-    
-    return stats
\ No newline at end of file
+        stats['total_actions'] += count
+        stats['action_counts'][action] = stats['action_counts'].get(action, 0) + count
+    
+    def count_target(target, action, count):
+        # Count by target, and by action for each target
+        if target not in stats['target_counts']:
+            stats['target_counts'][target] = {
+                'count': 0,
+                'actions': {}
+            }
+        stats['target_counts'][target]['count'] += count
+        stats['target_counts'][target]['actions'][action] = stats['target_counts'][target]['actions'].get(action, 0) + count
+    
+    for action, count in action_query:
+        count_action(action, int(count))
+    
+    for target, action, count in target_query:
+        count_target(target, action, int(count))
+    
+    for target, action, count in raw_query:
+        count_action(action, count)
+        if target:
+            count_target(target, action, count)
+    
+    # Most recent actions (limit to 10)
+    for behavior in recent_query.order_by(UserBehavior.created_at.desc(), UserBehavior.id.desc()).limit(10):
+        stats['recent_actions'].append({
+            'action': behavior.action_type,
+            'target_id': behavior.target_id,
+            'data': behavior.data,
+            'timestamp': behavior.created_at.isoformat()
+        })
+    
+    return stats
@@ -11,4 +11,14 @@ class SessionConfig:
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///heartlink.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    BEHAVIOR_INGEST_SYNC = os.environ.get('BEHAVIOR_INGEST_SYNC') == '1'
+    BEHAVIOR_BUFFER_SIZE = int(os.environ.get('BEHAVIOR_BUFFER_SIZE', 10000))
+    BEHAVIOR_FLUSH_SIZE = int(os.environ.get('BEHAVIOR_FLUSH_SIZE', 500))
+    BEHAVIOR_FLUSH_INTERVAL = float(os.environ.get('BEHAVIOR_FLUSH_INTERVAL', 1.0))
+    BEHAVIOR_RETENTION_DAYS = int(os.environ.get('BEHAVIOR_RETENTION_DAYS', 90))
+    BEHAVIOR_ARCHIVE_DIR = os.environ.get('BEHAVIOR_ARCHIVE_DIR', 'behavior_archive')
+    PHOTO_STORE_DIR = os.environ.get('PHOTO_STORE_DIR', 'photo_store')
+    PHOTO_MAX_BYTES = int(os.environ.get('PHOTO_MAX_BYTES', 10 * 1024 * 1024))
+    PROFILE_VIEW_COALESCE_SECONDS = float(os.environ.get('PROFILE_VIEW_COALESCE_SECONDS', 0))
+    QUERY_COUNT_HEADER = os.environ.get('QUERY_COUNT_HEADER') == '1'
\ No newline at end of file
@@ -0,0 +1,139 @@
+import math
+
+# Coordinate parse states (mirrors the branches in MatchScore.calculate_location_proximity)
+COORDS_MISSING = 0
+COORDS_INVALID = 1
+COORDS_VALID = 2
+
+# Earth radius in km, same constant as helpers.calculate_distance
+EARTH_RADIUS_KM = 6371
+
+# Grid cells are CELL_DEGREES x CELL_DEGREES, numbered row-major from (-90, -180)
+# so that every latitude row is a contiguous range of cell ids
+CELL_DEGREES = 0.1
+LAT_CELLS = int(round(180 / CELL_DEGREES))
+LON_CELLS = int(round(360 / CELL_DEGREES))
+
+# Slack added to radius queries to cover distances being rounded to 2 decimals
+RADIUS_SLACK_KM = 0.01
+
+
+def parse_coordinates(coordinates):
+    """Parse a "lat,lon" string into (state, lat, lon)"""
+    if not coordinates:
+        return COORDS_MISSING, None, None
+
+    parts = coordinates.split(',')
+    if len(parts) != 2:
+        return COORDS_INVALID, None, None
+
+    try:
+        lat, lon = float(parts[0]), float(parts[1])
+    except (TypeError, ValueError):
+        return COORDS_INVALID, None, None
+
+    if not (math.isfinite(lat) and math.isfinite(lon)) or abs(lat) > 90:
+        return COORDS_INVALID, None, None
+
+    # Normalize longitude into [-180, 180) so range filters work
+    return COORDS_VALID, lat, (lon + 180) % 360 - 180
+
+
+def grid_cell(lat, lon):
+    """Get the grid cell id containing a point"""
+    row = min(int((lat + 90) // CELL_DEGREES), LAT_CELLS - 1)
+    col = int(((lon + 180) % 360) // CELL_DEGREES) % LON_CELLS
+    return row * LON_CELLS + col
+
+
+def _radius_spans(lat, radius_km):
+    """
+    Get the latitude and longitude half-widths (degrees) of a search circle
+
+    Returns None if the circle is too large to prune (it reaches a pole or
+    wraps the globe).
+    """
+    # Angular radius of the search circle
+    angle = (radius_km + RADIUS_SLACK_KM) / EARTH_RADIUS_KM
+    if angle >= math.pi / 2:
+        return None
+
+    lat_span = math.degrees(angle)
+    if lat - lat_span <= -90 or lat + lat_span >= 90:
+        return None
+
+    # Widest longitude difference of any point on the circle
+    ratio = math.sin(angle) / math.cos(math.radians(lat))
+    if ratio >= 1:
+        return None
+    lon_span = math.degrees(math.asin(ratio))
+    if lon_span >= 180 - CELL_DEGREES:
+        return None
+
+    return lat_span, lon_span
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Get the latitude/longitude box enclosing a search circle
+
+    Args:
+        lat: Latitude of the center
+        lon: Longitude of the center
+        radius_km: Search radius in kilometers
+
+    Returns:
+        (lat_min, lat_max, lon_ranges) where lon_ranges is a list of
+        inclusive (min, max) longitude ranges split at the antimeridian,
+        or None if the circle is too large to prune
+    """
+    spans = _radius_spans(lat, radius_km)
+    if spans is None:
+        return None
+
+    lat_span, lon_span = spans
+    lon_min, lon_max = lon - lon_span, lon + lon_span
+    if lon_min < -180:
+        lon_ranges = [(lon_min + 360, 180), (-180, lon_max)]
+    elif lon_max > 180:
+        lon_ranges = [(lon_min, 180), (-180, lon_max - 360)]
+    else:
+        lon_ranges = [(lon_min, lon_max)]
+
+    return lat - lat_span, lat + lat_span, lon_ranges
+
+
+def cell_ranges_within_radius(lat, lon, radius_km):
+    """
+    Get the grid cells that may contain points within radius_km of a point
+
+    Args:
+        lat: Latitude of the center
+        lon: Longitude of the center
+        radius_km: Search radius in kilometers
+
+    Returns:
+        List of inclusive (first_cell, last_cell) id ranges, or None if the
+        circle is too large to prune
+    """
+    spans = _radius_spans(lat, radius_km)
+    if spans is None:
+        return None
+
+    lat_span, lon_span = spans
+    first_row = int((lat - lat_span + 90) // CELL_DEGREES)
+    last_row = min(int((lat + lat_span + 90) // CELL_DEGREES), LAT_CELLS - 1)
+    first_col = int(((lon - lon_span + 180) % 360) // CELL_DEGREES) % LON_CELLS
+    last_col = int(((lon + lon_span + 180) % 360) // CELL_DEGREES) % LON_CELLS
+
+    # Split the column range where it wraps around the antimeridian
+    if first_col <= last_col:
+        col_ranges = [(first_col, last_col)]
+    else:
+        col_ranges = [(first_col, LON_CELLS - 1), (0, last_col)]
+
+    ranges = []
+    for row in range(first_row, last_row + 1):
+        for start, end in col_ranges:
+            ranges.append((row * LON_CELLS + start, row * LON_CELLS + end))
+    return ranges
@@ -1,6 +1,8 @@
 import functools
+import base64
+import json
 from flask import request, jsonify
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import math
 
 def validate_request(schema):
@@ -33,21 +35,56 @@ def format_date(date):
         return date.strftime('%Y-%m-%d')
     return str(date)  # Return as is if it's already a string or other format
 
-def calculate_age(date_of_birth):
-    """Calculate age from date of birth string (YYYY-MM-DD)"""
+def parse_date(value):
+    """Parse a date string (YYYY-MM-DD), returning None if it's invalid"""
+    if isinstance(value, date):
+        return value
     try:
-        dob = datetime.strptime(date_of_birth, '%Y-%m-%d').date()
-        today = date.today()
-        age = today.year - dob.year
-        
-        # Check if birthday has occurred this year
-        if (today.month, today.day) < (dob.month, dob.day):
-            age -= 1
-            
-        return age
-    except Exception:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
         return None
 
+def calculate_age(date_of_birth):
+    """Calculate age from a date of birth (date or YYYY-MM-DD string)"""
+    dob = parse_date(date_of_birth)
+    if dob is None:
+        return None
+    
+    today = date.today()
+    age = today.year - dob.year
+    
+    # Check if birthday has occurred this year
+    if (today.month, today.day) < (dob.month, dob.day):
+        age -= 1
+        
+    return age
+
+# Oldest age worth filtering on; larger limits are treated as no limit
+MAX_AGE = 150
+
+def years_before(day, years):
+    """Get the same calendar day `years` earlier (Feb 29 becomes Feb 28)"""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+def birth_date_bounds(min_age, max_age, today=None):
+    """
+    Convert an age range into a date of birth range
+    
+    Someone is at least min_age when born on or before `latest`, and at
+    most max_age when born after `earliest`. Ages are clamped to
+    0-MAX_AGE, so out of range limits filter nothing instead of failing.
+    
+    Returns:
+        (earliest, latest) tuple; filter with earliest < dob <= latest
+    """
+    today = today or date.today()
+    min_age = min(max(min_age, 0), MAX_AGE)
+    max_age = min(max(max_age, 0), MAX_AGE)
+    return years_before(today, max_age + 1), years_before(today, min_age)
+
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two coordinates in kilometers"""
     def deg2rad(deg):
@@ -70,4 +107,60 @@ def calculate_distance(lat1, lon1, lat2, lon2):
         
         return round(distance, 2)
     except Exception:
-        return None
\ No newline at end of file
+        return None
+
+def encode_cursor(**position):
+    """Encode a pagination position as an opaque URL-safe cursor"""
+    payload = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor made by encode_cursor, returning None if it's invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError):
+        return None
+    return position if isinstance(position, dict) else None
+
+# Largest page a list endpoint returns
+MAX_PAGE_SIZE = 100
+
+def page_size(default=20):
+    """Get the request's page size from `limit`, clamped to 1-MAX_PAGE_SIZE"""
+    return min(max(request.args.get('limit', default, type=int), 1), MAX_PAGE_SIZE)
+
+# Sync tokens reach back this far so that rows committed while a sync was
+# running are picked up by the next one (clients de-duplicate by id)
+SYNC_OVERLAP = timedelta(seconds=5)
+
+def encode_sync_token(moment=None):
+    """Create a sync token covering changes after `moment` (defaults to now)"""
+    moment = (moment or datetime.utcnow()) - SYNC_OVERLAP
+    return encode_cursor(since=moment.isoformat())
+
+def decode_sync_token(token):
+    """Decode a sync token into a datetime, returning None if it's invalid"""
+    position = decode_cursor(token)
+    try:
+        return datetime.fromisoformat(position['since'])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+def encode_sync_continuation(moment, after_id):
+    """Create a sync token resuming a truncated delta after the row (moment, after_id)"""
+    return encode_cursor(since=moment.isoformat(), after=after_id)
+
+def decode_sync_continuation(token):
+    """
+    Decode a sync token that may resume a truncated delta
+    
+    Returns:
+        (since, after_id) tuple, after_id None for plain sync tokens, or
+        None if the token is invalid
+    """
+    since = decode_sync_token(token)
+    after_id = (decode_cursor(token) or {}).get('after')
+    if not since or not (after_id is None or (isinstance(after_id, int) and not isinstance(after_id, bool))):
+        return None
+    return since, after_id
@@ -0,0 +1,73 @@
+from sqlalchemy import func, case
+from python_backend.models.db import db
+from python_backend.models.models import Match, Message
+
+
+def rebuild_match_summaries():
+    """
+    Rebuild every match's conversation summary from raw messages
+
+    Read watermarks are kept, or seeded from the legacy per-message
+    is_read flags where missing, and unread counts are derived from them.
+
+    Used to backfill the summary columns for existing databases.
+
+    Returns:
+        Number of matches updated
+    """
+    # Last message of every match, newest first with the id breaking ties
+    ranked_messages = db.session.query(
+        Message.match_id,
+        Message.id,
+        Message.sent_at,
+        func.row_number().over(
+            partition_by=Message.match_id,
+            order_by=(Message.sent_at.desc(), Message.id.desc())
+        ).label('position')
+    ).subquery()
+
+    last_messages = {
+        match_id: (message_id, sent_at)
+        for match_id, message_id, sent_at in db.session.query(
+            ranked_messages.c.match_id, ranked_messages.c.id, ranked_messages.c.sent_at
+        ).filter(ranked_messages.c.position == 1)
+    }
+
+    # Newest message each receiver had read under the legacy per-message flags
+    legacy_read_ids = {
+        (match_id, receiver_id): message_id
+        for match_id, receiver_id, message_id in db.session.query(
+            Message.match_id, Message.receiver_id, func.max(Message.id)
+        ).filter(Message.is_read == True).group_by(Message.match_id, Message.receiver_id)
+    }
+
+    # Seed missing read watermarks from the legacy flags
+    matches = Match.query.all()
+    for match in matches:
+        match.last_message_id, match.last_message_at = last_messages.get(match.id, (None, None))
+        if match.user1_last_read_id is None:
+            match.user1_last_read_id = legacy_read_ids.get((match.id, match.user1_id))
+        if match.user2_last_read_id is None:
+            match.user2_last_read_id = legacy_read_ids.get((match.id, match.user2_id))
+    db.session.flush()
+
+    # Unread messages per (match, receiver): everything past the receiver's watermark
+    watermark = case(
+        (Message.receiver_id == Match.user1_id, func.coalesce(Match.user1_last_read_id, 0)),
+        else_=func.coalesce(Match.user2_last_read_id, 0)
+    )
+    unread_counts = {
+        (match_id, receiver_id): count
+        for match_id, receiver_id, count in db.session.query(
+            Message.match_id, Message.receiver_id, func.count(Message.id)
+        ).join(Match, Match.id == Message.match_id).filter(
+            Message.id > watermark
+        ).group_by(Message.match_id, Message.receiver_id)
+    }
+
+    for match in matches:
+        match.user1_unread_count = unread_counts.get((match.id, match.user1_id), 0)
+        match.user2_unread_count = unread_counts.get((match.id, match.user2_id), 0)
+
+    db.session.commit()
+    return len(matches)
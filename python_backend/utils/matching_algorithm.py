@@ -1,7 +1,18 @@
 import math
+from itertools import islice
 from datetime import datetime, timedelta
 from python_backend.utils.helpers import calculate_age, calculate_distance
 from python_backend.models.models import User, Profile, Like
+from python_backend.utils.batch_scoring import CandidatePool, BatchMatchScore, TopCandidates
+from python_backend.utils.behavior_signals import BehaviorSignals
+from python_backend.utils.activity_histogram import is_active, activity_overlap
+from python_backend.utils.profile_cards import card_load_options, serialize_card
+
+# Number of ranked candidates kept for paging through recommendations
+RANKING_DEPTH = 500
+
+# Number of candidate rows loaded and scored at a time
+CANDIDATE_CHUNK_SIZE = 2000
 
 class MatchScore:
     """Class to calculate compatibility scores between users"""
@@ -92,31 +103,26 @@ class MatchScore:
             else:
                 return 0.20
         
-        # Calculate distance
-        try:
-            user_coords = self.user_profile.coordinates.split(',')
-            target_coords = self.target_profile.coordinates.split(',')
-            
-            if len(user_coords) == 2 and len(target_coords) == 2:
-                user_lat, user_lon = user_coords
-                target_lat, target_lon = target_coords
-                
-                distance = calculate_distance(user_lat, user_lon, target_lat, target_lon)
-                
-                # Convert distance to a score (closer = higher score)
-                # Score decreases linearly up to 100 km, then more slowly
-                if distance <= 5:  # Very close (same neighborhood)
-                    return 1.0
-                elif distance <= 20:  # Same city
-                    return 0.8 - 0.03 * (distance - 5)
-                elif distance <= 100:  # Nearby cities
-                    return 0.5 - 0.003 * (distance - 20)
-                else:  # Far away
-                    return max(0.2, 0.3 - 0.001 * (distance - 100))
-        except Exception:
-            return 0.5  # Default to neutral if calculation fails
-            
-        return 0.5  # Default
+        # Coordinates that couldn't be parsed get a neutral score
+        if self.user_profile.latitude is None or self.target_profile.latitude is None:
+            return 0.5
+        
+        # Calculate distance from the numeric coordinate columns
+        distance = calculate_distance(
+            self.user_profile.latitude, self.user_profile.longitude,
+            self.target_profile.latitude, self.target_profile.longitude
+        )
+        
+        # Convert distance to a score (closer = higher score)
+        # Score decreases linearly up to 100 km, then more slowly
+        if distance <= 5:  # Very close (same neighborhood)
+            return 1.0
+        elif distance <= 20:  # Same city
+            return 0.8 - 0.03 * (distance - 5)
+        elif distance <= 100:  # Nearby cities
+            return 0.5 - 0.003 * (distance - 20)
+        else:  # Far away
+            return max(0.2, 0.3 - 0.001 * (distance - 100))
     
     def calculate_interests_overlap(self):
         """Calculate shared interests score (0-1)"""
@@ -234,25 +240,18 @@ class MatchScore:
     
     def _get_messaging_patterns(self):
         """Calculate score based on messaging patterns"""
-        from python_backend.models.models import UserBehavior
+        from python_backend.models.models import BehaviorTargetDailyRollup
         
-        # Get messaging behavior for the user
-        user_behaviors = UserBehavior.query.filter_by(
+        # Check whether the user has ever messaged the target (the daily
+        # rollups outlive archived raw events)
+        messaged = BehaviorTargetDailyRollup.query.filter_by(
             user_id=self.user.id,
+            target_id=self.target_user.id,
             action_type='send_message'
-        ).all()
-        
-        if not user_behaviors:
-            return 0.5  # No messaging data
-        
-        # Calculate preferences based on who the user messages
-        message_targets = {}
-        for behavior in user_behaviors:
-            if behavior.target_id:
-                message_targets[behavior.target_id] = message_targets.get(behavior.target_id, 0) + 1
+        ).first()
         
         # If user has messaged this target before, higher score
-        if self.target_user.id in message_targets:
+        if messaged:
             return 0.9  # Strong signal of interest
         
         # Check if target has similar attributes to people the user messages
@@ -261,82 +260,46 @@ class MatchScore:
     
     def _get_activity_time_overlap(self):
         """Calculate score based on when users are active"""
-        from python_backend.models.models import UserBehavior
-        from datetime import datetime, timedelta
-        
-        # Get recent activities (last 7 days)
-        since_date = datetime.utcnow() - timedelta(days=7)
+        from python_backend.models.models import UserActivityHistogram
         
-        user_activities = UserBehavior.query.filter(
-            UserBehavior.user_id == self.user.id,
-            UserBehavior.created_at >= since_date
-        ).all()
+        # Hour-of-day histograms are maintained by track_user_behavior
+        user_histogram = UserActivityHistogram.query.get(self.user.id)
+        target_histogram = UserActivityHistogram.query.get(self.target_user.id)
         
-        target_activities = UserBehavior.query.filter(
-            UserBehavior.user_id == self.target_user.id,
-            UserBehavior.created_at >= since_date
-        ).all()
+        if not is_active(user_histogram) or not is_active(target_histogram):
+            return 0.5  # No recent activity data for comparison
         
-        if not user_activities or not target_activities:
-            return 0.5  # No activity data for comparison
-        
-        # Calculate activity hour distribution (when are they active)
-        user_hours = {}
-        target_hours = {}
-        
-        for behavior in user_activities:
-            hour = behavior.created_at.hour
-            user_hours[hour] = user_hours.get(hour, 0) + 1
-            
-        for behavior in target_activities:
-            hour = behavior.created_at.hour
-            target_hours[hour] = target_hours.get(hour, 0) + 1
-        
-        # Normalize distributions
-        total_user = sum(user_hours.values())
-        total_target = sum(target_hours.values())
-        
-        for hour in user_hours:
-            user_hours[hour] /= total_user
-            
-        for hour in target_hours:
-            target_hours[hour] /= total_target
-        
-        # Calculate overlap in activity patterns
-        overlap = 0
-        for hour in range(24):
-            user_val = user_hours.get(hour, 0)
-            target_val = target_hours.get(hour, 0)
-            overlap += min(user_val, target_val)
-        
-        # Scale overlap to 0-1 (higher overlap = higher score)
-        return min(overlap * 2, 1.0)
+        return activity_overlap(user_histogram.hours, target_histogram.hours)
 
 
-def get_user_recommendations(user_id, db_session, limit=20, min_score=50):
+def rank_candidates(user_id, db_session, min_score=50, depth=RANKING_DEPTH, user=None, user_profile=None):
     """
-    Get recommended users based on compatibility scores
+    Rank candidate users by compatibility score
     
     Args:
-        user_id: The ID of the user to get recommendations for
+        user_id: The ID of the user to rank candidates for
         db_session: SQLAlchemy database session
-        limit: Maximum number of recommendations to return
         min_score: Minimum compatibility score (0-100)
+        depth: Maximum number of ranked candidates to keep
+        user: The user's row, if the caller already has it
+        user_profile: The user's Profile row, if the caller already has it
         
     Returns:
-        List of user recommendations with compatibility scores
+        List of CandidateFeatures, best first
     """
-    # Get the user and their profile
-    user = db_session.query(User).get(user_id)
+    # Get the user and their profile, unless already loaded
+    if user is None:
+        user = db_session.query(User).get(user_id)
     if not user:
         return []
         
-    user_profile = db_session.query(Profile).filter_by(user_id=user_id).first()
+    if user_profile is None:
+        user_profile = db_session.query(Profile).filter_by(user_id=user_id).first()
     if not user_profile:
         return []
     
     # Get users that match basic criteria (gender preference, verified, etc.)
-    base_query = db_session.query(User, Profile).join(Profile, User.id == Profile.user_id)
+    base_query = CandidatePool.query(db_session)
     
     # Filter by gender preference
     if user.interested_in != 'Both':
@@ -352,25 +315,113 @@ def get_user_recommendations(user_id, db_session, limit=20, min_score=50):
     liked_users = db_session.query(Like.liked_id).filter(Like.liker_id == user_id).subquery()
     base_query = base_query.filter(~User.id.in_(liked_users))
     
-    # Get potential matches
-    potential_matches = base_query.all()
+    # Load behavioral data for the viewer in a few queries
+    signals = BehaviorSignals.prefetch(user_id, db_session)
+    
+    # Stream candidates in chunks, keeping only the best `depth` above the
+    # minimum score (ties keep query order)
+    top = TopCandidates(depth, min_score)
+    rows = iter(base_query.yield_per(CANDIDATE_CHUNK_SIZE))
+    while True:
+        chunk = list(islice(rows, CANDIDATE_CHUNK_SIZE))
+        if not chunk:
+            break
+        
+        # Score every candidate on the cheap factors and bound the rest
+        pool = CandidatePool.from_rows(chunk)
+        scorer = BatchMatchScore(user, user_profile, pool)
+        base_scores = scorer.calculate_base_scores()
+        lower, upper = scorer.calculate_score_bounds(base_scores, signals)
+        
+        # Only load activity histograms for candidates that can still make the cut
+        survivors = top.prune(lower, upper)
+        scores = lower  # Only survivors' scores are offered
+        if survivors.any():
+            finalists = pool.take(survivors)
+            finalists.load_activity_hours(db_session)
+            behavioral_scores = BatchMatchScore(
+                user, user_profile, finalists
+            ).calculate_behavioral_patterns(signals)
+            scores[survivors] = scorer.combine_scores(base_scores[survivors], behavioral_scores)
+        
+        # Candidates that make the cut keep what scoring worked out for their cards
+        top.offer(pool.user_ids, scores, survivors, describe=lambda index: scorer.candidate_features(
+            index, scores[index]
+        ))
+    
+    return top.records()
+
+
+def load_recommendations(ranking, db_session, user_profile=None):
+    """
+    Load the profile cards of the users in a slice of a ranking
+    
+    Ages come from the ranking's CandidateFeatures. The card columns are
+    loaded fresh, since the ranking may be minutes old, and distances are
+    worked out from them so that cached rankings show where people are now.
+    
+    Args:
+        ranking: List of CandidateFeatures
+        db_session: SQLAlchemy database session
+        user_profile: The viewer's Profile row, for distances
+        
+    Returns:
+        List of recommendation cards in ranking order
+    """
+    if not ranking:
+        return []
+    
+    rows = db_session.query(User, Profile).join(Profile, User.id == Profile.user_id).options(
+        *card_load_options()
+    ).filter(
+        User.id.in_([features.user_id for features in ranking])
+    ).all()
+    rows_by_id = {target_user.id: (target_user, target_profile) for target_user, target_profile in rows}
     
-    # Calculate compatibility scores
     recommendations = []
-    for target_user, target_profile in potential_matches:
-        matcher = MatchScore(user, user_profile, target_user, target_profile)
-        score = matcher.calculate_total_score()
-        
-        # Only include recommendations above the minimum score
-        if score >= min_score:
-            recommendations.append({
-                'user': target_user.to_dict(),
-                'profile': target_profile.to_dict(),
-                'compatibility_score': score
-            })
+    for features in ranking:
+        # Skip users deleted since the ranking was computed
+        if features.user_id not in rows_by_id:
+            continue
+        
+        target_user, target_profile = rows_by_id[features.user_id]
+        card = serialize_card(
+            target_user, target_profile,
+            age=features.age,
+            compatibility_score=features.score
+        )
+        
+        # Distance if both users have usable coordinates
+        if user_profile is not None and user_profile.latitude is not None and target_profile.latitude is not None:
+            card['distance'] = calculate_distance(
+                user_profile.latitude, user_profile.longitude,
+                target_profile.latitude, target_profile.longitude
+            )
+        
+        recommendations.append(card)
     
-    # Sort by compatibility score (highest first)
-    recommendations.sort(key=lambda x: x['compatibility_score'], reverse=True)
+    return recommendations
+
+
+def get_user_recommendations(user_id, db_session, limit=20, min_score=50, user=None, user_profile=None):
+    """
+    Get recommended users based on compatibility scores
+    
+    Args:
+        user_id: The ID of the user to get recommendations for
+        db_session: SQLAlchemy database session
+        limit: Maximum number of recommendations to return
+        min_score: Minimum compatibility score (0-100)
+        user: The user's row, if the caller already has it
+        user_profile: The user's Profile row, if the caller already has it
+        
+    Returns:
+        List of recommendation cards with compatibility scores
+    """
+    if user_profile is None:
+        user_profile = db_session.query(Profile).filter_by(user_id=user_id).first()
     
-    # Limit the number of recommendations
-    return recommendations[:limit]
\ No newline at end of file
+    ranking = rank_candidates(
+        user_id, db_session, min_score=min_score, depth=limit, user=user, user_profile=user_profile
+    )
+    return load_recommendations(ranking, db_session, user_profile)
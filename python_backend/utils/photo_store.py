@@ -0,0 +1,218 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+from flask import current_app
+from sqlalchemy import String, type_coerce
+from python_backend.models.db import db
+from python_backend.models.models import Profile
+
+# Pillow is a declared dependency. Should it be missing, photos are still
+# stored and served as uploaded, with no resized variants
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Photos are served from here, by content hash
+PHOTO_URL_PREFIX = '/api/photos/'
+
+# Resized variants (longest side in pixels), generated when photos are stored
+PHOTO_SIZES = {
+    'thumb': 160,
+    'card': 640,
+}
+
+# Leading bytes of the accepted image formats
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+DATA_URL_PATTERN = re.compile(r'^data:image/[\w.+-]+;base64,', re.IGNORECASE)
+PHOTO_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def image_type(data):
+    """Get the mimetype of image bytes, or None if they aren't an accepted image"""
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    return None
+
+
+def is_photo_hash(value):
+    """Check whether a string is a photo content hash"""
+    return bool(PHOTO_HASH_PATTERN.match(value))
+
+
+def photo_url(photo_hash):
+    """Get the URL a stored photo is served from"""
+    return f"{PHOTO_URL_PREFIX}{photo_hash}"
+
+
+def photo_path(photo_hash, size=None):
+    """Get the file of a stored photo, or of one of its resized variants"""
+    name = f"{photo_hash}-{size}" if size else photo_hash
+    return os.path.join(current_app.config['PHOTO_STORE_DIR'], photo_hash[:2], name)
+
+
+def _write_file(path, data):
+    """Write a file atomically, so readers never see a partial photo"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as photo_file:
+        photo_file.write(data)
+    os.replace(temporary_path, path)
+
+
+def _resize(data, size):
+    """Scale an image down to fit a size x size box, as JPEG bytes"""
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail((size, size))
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=85, optimize=True)
+        return output.getvalue()
+
+
+def _write_variants(photo_hash, data):
+    """Generate the resized variants of a photo that don't exist yet"""
+    if Image is None:
+        return
+
+    for size_name, size in PHOTO_SIZES.items():
+        path = photo_path(photo_hash, size_name)
+        if os.path.exists(path):
+            continue
+        try:
+            _write_file(path, _resize(data, size))
+        except Exception as e:
+            raise ValueError(f"Unreadable photo: {e}")
+
+
+def variant_path(photo_hash, size):
+    """
+    Get the file of a resized variant, generating it if it is missing
+
+    Photos stored before Pillow was installed get their variants on the
+    first request for them.
+
+    Returns:
+        Path of the variant, or None if it can't be generated
+    """
+    path = photo_path(photo_hash, size)
+    if os.path.exists(path):
+        return path
+
+    original_path = photo_path(photo_hash)
+    if Image is None or not os.path.exists(original_path):
+        return None
+
+    with open(original_path, 'rb') as photo_file:
+        data = photo_file.read()
+    try:
+        _write_variants(photo_hash, data)
+    except ValueError as e:
+        print(f"Error resizing photo {photo_hash}: {e}")
+        return None
+    return path
+
+
+def save_photo(data, limit=True):
+    """
+    Store a photo under the hash of its content
+
+    Storing the same photo again only fills in missing variants.
+
+    Args:
+        data: Image bytes
+        limit: Whether to enforce PHOTO_MAX_BYTES
+
+    Returns:
+        The photo's content hash
+
+    Raises:
+        ValueError: If the data isn't an accepted image or is too large
+    """
+    if limit and len(data) > current_app.config['PHOTO_MAX_BYTES']:
+        raise ValueError("Photo is too large")
+    if not image_type(data):
+        raise ValueError("Unsupported photo format")
+
+    photo_hash = hashlib.sha256(data).hexdigest()
+    path = photo_path(photo_hash)
+
+    # Variants first, so a newly stored photo always has them
+    _write_variants(photo_hash, data)
+    if not os.path.exists(path):
+        _write_file(path, data)
+    return photo_hash
+
+
+def store_photos(photos, limit=True):
+    """
+    Move inline photos of a profile into the photo store
+
+    Base64 data URLs are stored and replaced with their photo URL; photo
+    URLs and other links are kept as they are.
+
+    Args:
+        photos: List of photo strings, as sent by clients
+        limit: Whether to enforce PHOTO_MAX_BYTES
+
+    Returns:
+        List of photo URLs
+
+    Raises:
+        ValueError: If a data URL doesn't hold an accepted image
+    """
+    stored = []
+    for photo in photos or []:
+        match = DATA_URL_PATTERN.match(photo) if isinstance(photo, str) else None
+        if match:
+            try:
+                data = base64.b64decode(photo[match.end():], validate=True)
+            except (binascii.Error, ValueError):
+                raise ValueError("Invalid photo data")
+            photo = photo_url(save_photo(data, limit))
+        stored.append(photo)
+    return stored
+
+
+def migrate_inline_photos():
+    """
+    Move base64 photos stored in profiles into the photo store
+
+    Profiles are loaded one at a time, so only one profile's photos are in
+    memory at once. The upload size limit doesn't apply, and photos that
+    aren't valid images are dropped.
+
+    Returns:
+        Number of profiles updated
+    """
+    profile_ids = [
+        profile_id for (profile_id,) in db.session.query(Profile.id).filter(
+            type_coerce(Profile.photos, String).like('%data:image%')
+        )
+    ]
+
+    for profile_id in profile_ids:
+        profile = db.session.get(Profile, profile_id)
+        photos = []
+        for photo in profile.photos or []:
+            try:
+                photos.extend(store_photos([photo], limit=False))
+            except ValueError as e:
+                print(f"Error moving a photo of profile {profile_id}: {e}")
+        profile.photos = photos
+        db.session.commit()
+        db.session.expunge(profile)
+
+    return len(profile_ids)
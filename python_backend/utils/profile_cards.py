@@ -0,0 +1,44 @@
+from sqlalchemy.orm import load_only
+from python_backend.models.models import User, Profile
+from python_backend.utils.serializers import compile_serializer
+
+# What a profile card in discover and recommendations shows. Keys and
+# values match the merged User/Profile to_dict() these lists used to return,
+# where the profile's id wins over the user's
+CARD_USER_FIELDS = ('username', 'first_name', 'last_name', 'date_of_birth', 'gender')
+CARD_PROFILE_FIELDS = (
+    'id', 'user_id', 'bio', 'country', 'state', 'city', 'vicinity',
+    'profession', 'last_active', 'interests', 'photos'
+)
+
+# Loaded for distances, never sent
+CARD_LOCATION_FIELDS = ('latitude', 'longitude')
+
+
+def card_load_options():
+    """Get query options that load only the card columns of User and Profile rows"""
+    return (
+        load_only(*[getattr(User, field) for field in CARD_USER_FIELDS]),
+        load_only(*[getattr(Profile, field) for field in CARD_PROFILE_FIELDS + CARD_LOCATION_FIELDS])
+    )
+
+
+def serialize_card(user, profile, **extra):
+    """
+    Serialize a user and profile loaded with card_load_options()
+
+    Same output as to_dict(only=...) on each, through compiled serializers.
+
+    Args:
+        user: User row
+        profile: The user's Profile row
+        **extra: Computed fields to add, such as age or distance
+
+    Returns:
+        Card dict
+    """
+    return {
+        **compile_serializer(User, CARD_USER_FIELDS)(user),
+        **compile_serializer(Profile, CARD_PROFILE_FIELDS)(profile),
+        **extra
+    }
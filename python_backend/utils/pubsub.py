@@ -0,0 +1,87 @@
+import queue
+import threading
+
+
+class Subscription:
+    """A subscriber's queue of messages on one channel"""
+
+    def __init__(self, broker, channel, max_pending=100):
+        self.broker = broker
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=max_pending)
+
+    def deliver(self, message):
+        """Queue a message, dropping it if the subscriber has fallen behind"""
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            pass
+
+    def get(self, timeout=None):
+        """Wait for the next message, or return None after timeout seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Stop receiving messages"""
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Publish/subscribe between request threads of a single process
+
+    Subscribers block on their own queue, so an idle subscription costs a
+    sleeping thread and nothing else. With several worker processes, swap
+    in a broker backed by a shared service (see set_broker) that provides
+    the same subscribe/unsubscribe/publish methods.
+    """
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Subscribe to a channel"""
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription"""
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel, message):
+        """Deliver a message to every subscriber of a channel"""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+
+_broker = InProcessBroker()
+
+
+def get_broker():
+    """Get the broker used for real-time delivery"""
+    return _broker
+
+
+def set_broker(broker):
+    """Replace the broker, e.g. with one shared by several worker processes"""
+    global _broker
+    _broker = broker
+
+
+def match_channel(match_id):
+    """Get the channel name for a match's conversation"""
+    return f"match:{match_id}"
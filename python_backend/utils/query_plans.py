@@ -0,0 +1,234 @@
+import base64
+import io
+import re
+import tempfile
+from datetime import date, datetime, timedelta
+import click
+from sqlalchemy import event
+from python_backend.models.db import db
+from python_backend.models.models import User, Profile, Like, Match, Message
+from python_backend.utils import email_service
+from python_backend.utils.auth import hash_password
+from python_backend.utils.behavior_ingest import write_behaviors
+from python_backend.utils.helpers import encode_sync_token
+from python_backend.utils.photo_store import save_photo
+
+# Tables some endpoint reads in full by design: ranking recommendations
+# streams every candidate, which is what the snapshot cache is for
+ALLOWED_SCANS = {
+    'discover.get_recommendations': {'users'},
+}
+
+# Statements with a WHERE clause worth explaining
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+# "SCAN <table>" lines of EXPLAIN QUERY PLAN are full table or index scans
+SCAN_PATTERN = re.compile(r'^SCAN (\w+)')
+
+# Endpoints that aren't API calls
+UNCHECKED_ENDPOINTS = {'serve', 'static'}
+
+# A 1x1 PNG, uploaded to exercise the photo endpoints
+PHOTO = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg=='
+)
+
+PASSWORD = 'query-plan-check'
+
+
+def _seed():
+    """Create a few users with a match, messages and behavior to exercise the endpoints"""
+    users = []
+    for index, (name, gender, interested_in) in enumerate([
+        ('alice', 'Female', 'Male'), ('bob', 'Male', 'Female'), ('carol', 'Female', 'Both')
+    ]):
+        user = User(
+            username=name, email=f"{name}@example.com", password=hash_password(PASSWORD),
+            first_name=name.title(), date_of_birth=date(1990 + index, 1, 1),
+            gender=gender, interested_in=interested_in, is_verified=True,
+            verification_token=f"{name}-token", verification_token_expiry=datetime.utcnow() + timedelta(days=1)
+        )
+        profile = Profile(
+            user=user, coordinates=f"{30 + index * 0.01},{-97 - index * 0.01}", city='Austin',
+            country='US', profession='Engineer', interests=['hiking', 'music'], last_active=datetime.utcnow()
+        )
+        db.session.add_all([user, profile])
+        users.append(user)
+    db.session.flush()
+
+    alice, bob, carol = users
+    match = Match(user1_id=alice.id, user2_id=bob.id)
+    db.session.add_all([Like(liker_id=bob.id, liked_id=alice.id), match])
+    db.session.flush()
+    for content in ('Hi', 'Hello'):
+        db.session.add(Message(match_id=match.id, sender_id=bob.id, receiver_id=alice.id, content=content))
+    db.session.commit()
+
+    write_behaviors([
+        {'user_id': alice.id, 'action_type': action_type, 'target_id': bob.id, 'data': None,
+         'created_at': datetime.utcnow() - timedelta(days=days)}
+        for action_type in ('view_profile', 'send_message') for days in (0, 3)
+    ])
+    return alice, bob, carol, match
+
+
+def _endpoints(alice, bob, carol, match):
+    """
+    Requests covering every endpoint, made as alice until verify-face logs
+    carol in and register logs the new, unverified user in
+    """
+    sync_token = encode_sync_token(datetime.utcnow() - timedelta(days=1))
+    messages = f"/api/matches/{match.id}/messages"
+    newest_message = Message.query.filter_by(match_id=match.id).order_by(Message.id.desc()).first()
+    photo_hash = save_photo(PHOTO)
+    return [
+        ('GET', '/api/auth/me', None),
+        ('POST', '/api/auth/login', {'username': 'alice', 'password': PASSWORD}),
+        ('GET', f"/api/auth/verification/{carol.verification_token}", None),
+        ('GET', '/api/profile', None),
+        ('PATCH', '/api/profile', {'bio': 'Hello'}),
+        ('GET', '/api/discover', None),
+        ('GET', '/api/discover?maxDistance=50&minAge=20&maxAge=60', None),
+        ('GET', '/api/discover/recommendations', None),
+        ('POST', '/api/likes', {'liked_id': bob.id}),
+        ('POST', '/api/likes', {'liked_id': carol.id}),
+        ('GET', '/api/matches', None),
+        ('GET', f"/api/matches?since={sync_token}", None),
+        ('POST', messages, {'content': 'Hey'}),
+        ('GET', messages, None),
+        ('GET', f"{messages}?since={sync_token}", None),
+        ('GET', f"{messages}?before={newest_message.id}", None),
+        ('POST', '/api/behavior/track', {'action_type': 'view_profile', 'target_id': bob.id}),
+        ('POST', '/api/behavior/track', {'action_type': 'send_message', 'target_id': bob.id}),
+        ('POST', f"/api/behavior/profile-view/{bob.id}", None),
+        ('GET', '/api/behavior/stats', None),
+        ('POST', '/api/photos', {'photo': (io.BytesIO(PHOTO), 'photo.png')}),
+        ('GET', f"/api/photos/{photo_hash}", None),
+        ('GET', f"/api/photos/{photo_hash}?size=thumb", None),
+        ('GET', f"{messages}/stream", None),
+        ('POST', '/api/auth/forgot-password', {'email': alice.email}),
+        ('POST', '/api/auth/forgot-username', {'email': alice.email}),
+        ('POST', '/api/auth/reset-password', {'token': bob.verification_token, 'password': PASSWORD}),
+        ('POST', '/api/auth/verify-face', {'token': carol.verification_token}),
+        ('POST', '/api/auth/register', {
+            'username': 'dave', 'password': PASSWORD, 'email': 'dave@example.com', 'first_name': 'Dave',
+            'date_of_birth': '1993-01-01', 'gender': 'Male', 'interested_in': 'Female'
+        }),
+        ('POST', '/api/auth/resend-verification', None),
+        ('POST', '/api/auth/logout', None),
+    ]
+
+
+def _request(client, method, path, body):
+    """Make a request, sending dict bodies as JSON and file tuples as a form"""
+    if isinstance(body, dict) and any(isinstance(value, tuple) for value in body.values()):
+        response = client.open(path, method=method, data=body)
+    else:
+        response = client.open(path, method=method, json=body)
+
+    # Start streams so their queries run, then close them
+    if response.is_streamed:
+        next(iter(response.response), None)
+    response.close()
+    return response
+
+
+def _full_scans(connection, statement, parameters, allowed):
+    """Get the tables a statement reads in full, according to EXPLAIN QUERY PLAN"""
+    tables = set(db.metadata.tables) - allowed
+    plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [
+        row.detail for row in plan
+        if (scan := SCAN_PATTERN.match(row.detail)) and scan.group(1) in tables
+    ]
+
+
+def check_query_plans():
+    """
+    Explain every query the endpoints run and find the full table scans
+
+    The endpoints are called against a scratch in-memory SQLite database
+    built from the models, so this checks the indexes the models declare
+    (which migrations bring existing databases up to). Endpoints the check
+    doesn't call are reported too, and no emails are sent.
+
+    Returns:
+        List of problems, each an (endpoint, detail, statement) tuple
+    """
+    from python_backend.app import create_app
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        send_email = email_service.send_email
+        email_service.send_email = _skip_email
+        try:
+            return _check(create_app({
+                'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+                'TESTING': True,
+                'SESSION_FILE_DIR': f"{scratch_dir}/sessions",
+                'PHOTO_STORE_DIR': f"{scratch_dir}/photos",
+            }))
+        finally:
+            email_service.send_email = send_email
+
+
+def _skip_email(to_email, subject, text_content=None, html_content=None):
+    """Stand in for send_email, reporting success without sending anything"""
+    return True
+
+
+def _check(app):
+    """Run check_query_plans against a scratch app"""
+    problems = []
+
+    with app.app_context():
+        db.create_all()
+        alice, bob, carol, match = _seed()
+        requests = _endpoints(alice, bob, carol, match)
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = alice.id
+
+        statements = []
+
+        def capture(connection, cursor, statement, parameters, context, executemany):
+            if not executemany and statement.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+                statements.append((endpoint, statement, parameters))
+
+        called = set()
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            for method, path, body in requests:
+                endpoint = app.url_map.bind('localhost').match(path.split('?')[0], method=method)[0]
+                called.add(endpoint)
+                response = _request(client, method, path, body)
+                if response.status_code >= 500:
+                    problems.append((endpoint, f"{method} {path} returned {response.status_code}", ''))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        for rule in app.url_map.iter_rules():
+            if rule.endpoint not in called | UNCHECKED_ENDPOINTS:
+                problems.append((rule.endpoint, f"{rule.rule} isn't called by the check", ''))
+
+        connection = db.session.connection()
+        seen = set()
+        for endpoint, statement, parameters in statements:
+            if (endpoint, statement) in seen:
+                continue
+            seen.add((endpoint, statement))
+            for detail in _full_scans(connection, statement, parameters, ALLOWED_SCANS.get(endpoint, set())):
+                problems.append((endpoint, detail, statement))
+
+    return problems
+
+
+@click.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any endpoint query scans a whole table"""
+    problems = check_query_plans()
+    for endpoint, detail, statement in problems:
+        click.echo(f"{endpoint}: {detail}\n    {' '.join(statement.split())}", err=True)
+    if problems:
+        raise SystemExit(1)
+    click.echo("No full table scans")
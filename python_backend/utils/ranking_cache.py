@@ -0,0 +1,142 @@
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+class RankingSnapshot:
+    """A user's ranked recommendation list, frozen for paging"""
+
+    def __init__(self, snapshot_id, user_id, ranking, min_score=None, interested_in=None, created_at=None):
+        self.id = snapshot_id
+        self.user_id = user_id
+        self.ranking = ranking  # List of CandidateFeatures, best first
+        self.min_score = min_score
+        self.interested_in = interested_in  # The owner's preference bucket when ranked
+        self.created_at = created_at or datetime.utcnow()
+
+
+def _in_buckets(interested_in, genders):
+    """Check whether a ranking for this preference can include users of these genders"""
+    return interested_in in ('Both', None) or interested_in in genders
+
+
+class RankingSnapshotStore:
+    """
+    In-process store of ranking snapshots, addressed by opaque snapshot IDs
+
+    Paging through recommendations reads from a snapshot instead of
+    re-scoring the candidate pool for every page. Snapshots expire after
+    `ttl` and the least recently used ones are evicted beyond `max_snapshots`.
+
+    The latest snapshot of each (user, min_score) also serves as that user's
+    recommendation cache. Invalidating it makes the next first page re-rank,
+    while cursors into older snapshots keep paging through them.
+
+    Rankings take a while to compute, so an invalidation can land while one
+    is in progress. Callers take a token from start_ranking() first, and a
+    ranking invalidated in the meantime is saved for paging but not cached.
+    """
+
+    def __init__(self, ttl=timedelta(minutes=15), max_snapshots=1000):
+        self.ttl = ttl
+        self.max_snapshots = max_snapshots
+        self._snapshots = OrderedDict()
+        self._latest = {}  # {user_id: {min_score: snapshot_id}}
+        self._pending = {}  # {token: [user_id, interested_in, started_at, invalidated]}
+        self._lock = threading.Lock()
+
+    def start_ranking(self, user_id, interested_in=None):
+        """
+        Note that a ranking is about to be computed for a user
+
+        Returns:
+            Token to pass to save()
+        """
+        token = secrets.token_urlsafe(9)
+        now = datetime.utcnow()
+        with self._lock:
+            # Rankings that failed before being saved
+            for stale_token in [key for key, entry in self._pending.items() if now - entry[2] > self.ttl]:
+                del self._pending[stale_token]
+            self._pending[token] = [user_id, interested_in, now, False]
+        return token
+
+    def save(self, user_id, ranking, min_score=None, interested_in=None, token=None):
+        """
+        Store a ranking and return its snapshot
+
+        The snapshot becomes the user's cached ranking unless it was
+        invalidated after start_ranking() issued `token`.
+        """
+        snapshot = RankingSnapshot(secrets.token_urlsafe(9), user_id, ranking, min_score, interested_in)
+
+        with self._lock:
+            pending = self._pending.pop(token, None)
+            self._snapshots[snapshot.id] = snapshot
+            if not (pending and pending[3]):
+                self._latest.setdefault(user_id, {})[min_score] = snapshot.id
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+
+        return snapshot
+
+    def get(self, snapshot_id, user_id):
+        """Get a live snapshot owned by user_id, or None"""
+        with self._lock:
+            return self._get(snapshot_id, user_id)
+
+    def latest(self, user_id, min_score=None):
+        """Get the user's cached ranking for min_score, or None"""
+        with self._lock:
+            cached = self._latest.get(user_id, {})
+            snapshot = self._get(cached.get(min_score), user_id)
+            if not snapshot:
+                cached.pop(min_score, None)
+            return snapshot
+
+    def invalidate(self, *user_ids):
+        """Drop the cached rankings of the given users"""
+        with self._lock:
+            for user_id in user_ids:
+                self._latest.pop(user_id, None)
+            for pending in self._pending.values():
+                if pending[0] in user_ids:
+                    pending[3] = True
+
+    def invalidate_bucket(self, *genders):
+        """Drop the cached rankings of every user interested in any of `genders`"""
+        with self._lock:
+            for user_id in list(self._latest):
+                snapshot_ids = self._latest[user_id].values()
+                if any(self._snapshots.get(snapshot_id) is None or
+                       _in_buckets(self._snapshots[snapshot_id].interested_in, genders)
+                       for snapshot_id in snapshot_ids):
+                    del self._latest[user_id]
+            for pending in self._pending.values():
+                if _in_buckets(pending[1], genders):
+                    pending[3] = True
+
+    def clear(self):
+        """Drop every snapshot"""
+        with self._lock:
+            self._snapshots.clear()
+            self._latest.clear()
+            self._pending.clear()
+
+    def _get(self, snapshot_id, user_id):
+        """Look up a live snapshot (caller holds the lock)"""
+        snapshot = self._snapshots.get(snapshot_id)
+        if not snapshot or snapshot.user_id != user_id:
+            return None
+
+        if datetime.utcnow() - snapshot.created_at > self.ttl:
+            del self._snapshots[snapshot_id]
+            return None
+
+        self._snapshots.move_to_end(snapshot_id)
+        return snapshot
+
+
+# Shared store used by the recommendations endpoint
+ranking_snapshots = RankingSnapshotStore()
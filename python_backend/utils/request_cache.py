@@ -0,0 +1,81 @@
+from flask import g, has_request_context, session
+from sqlalchemy import event
+from python_backend.models.db import db
+from python_backend.models.models import User, Profile
+
+# Response header carrying the number of SQL statements a request ran,
+# sent when QUERY_COUNT_HEADER is enabled
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+
+def current_user():
+    """
+    Get the logged-in user, loaded at most once per request
+
+    Views, scoring and serialization within a request share the same row.
+    The cache is keyed on the session's user id, so logging in or out during
+    a request is picked up.
+
+    Returns:
+        User, or None if nobody is logged in or the user no longer exists
+    """
+    user_id = session.get('user_id')
+    cached = g.get('_current_user')
+    if cached is None or cached[0] != user_id:
+        cached = (user_id, db.session.get(User, user_id) if user_id else None)
+        g._current_user = cached
+    return cached[1]
+
+
+def current_profile():
+    """
+    Get the logged-in user's profile, loaded at most once per request
+
+    Returns:
+        Profile, or None if nobody is logged in or the user has no profile
+    """
+    user_id = session.get('user_id')
+    cached = g.get('_current_profile')
+    if cached is None or cached[0] != user_id:
+        profile = Profile.query.filter_by(user_id=user_id).first() if user_id else None
+        cached = (user_id, profile)
+        g._current_profile = cached
+    return cached[1]
+
+
+def query_count():
+    """Get the number of SQL statements the current request has run so far"""
+    return g.get('query_count', 0)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    """Count a statement against the request running it"""
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def init_request_cache(app):
+    """
+    Reset the request cache for every request and count the SQL it runs
+
+    flask.g can outlive a request when an app context is already pushed
+    (tests, CLI commands), so the cached rows and the count start over at
+    the beginning of each request. The count is sent in the X-Query-Count
+    header when QUERY_COUNT_HEADER is enabled.
+    """
+    app.config.setdefault('QUERY_COUNT_HEADER', False)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _count_query)
+
+    @app.before_request
+    def reset_request_cache():
+        g.pop('_current_user', None)
+        g.pop('_current_profile', None)
+        g.query_count = 0
+
+    @app.after_request
+    def add_query_count_header(response):
+        if app.config['QUERY_COUNT_HEADER']:
+            response.headers[QUERY_COUNT_HEADER] = str(query_count())
+        return response
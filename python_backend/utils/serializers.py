@@ -0,0 +1,150 @@
+import re
+from datetime import date, time
+from functools import lru_cache
+from flask import current_app, jsonify
+from sqlalchemy import inspect, Date, DateTime, Time, JSON
+from sqlalchemy_serializer.serializer import Serializer
+from python_backend.models.models import JsonList
+
+# orjson is optional: without it responses are encoded by Flask's provider
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Values that to_dict() passes through unchanged
+ATOMIC_TYPES = (int, str, float, bool, type(None))
+
+# orjson output that may differ from the standard library encoder: floats
+# written with an exponent, or in full where json would use one (< 1e-4)
+INEXACT_FLOAT_PATTERN = re.compile(rb'\d[eE]|0\.0000')
+
+
+def _plain(value):
+    """Copy a JSON column value the way to_dict() does"""
+    if isinstance(value, ATOMIC_TYPES):
+        return value
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return [_plain(item) for item in value]
+
+
+def _formatter(column_type, model):
+    """Get the function formatting a column's values like to_dict(), or None to copy them"""
+    if isinstance(column_type, DateTime):
+        datetime_format = model.datetime_format
+        return lambda value: value.strftime(datetime_format) if isinstance(value, date) else value
+    if isinstance(column_type, Date):
+        date_format = model.date_format
+        return lambda value: value.strftime(date_format) if isinstance(value, date) else value
+    if isinstance(column_type, Time):
+        time_format = model.time_format
+        return lambda value: value.strftime(time_format) if isinstance(value, time) else value
+    if isinstance(column_type, (JSON, JsonList)):
+        return _plain
+    try:
+        if column_type.python_type in ATOMIC_TYPES:
+            return None
+    except NotImplementedError:
+        pass
+
+    # Anything else goes through the generic serializer
+    serializer = Serializer(
+        date_format=model.date_format, datetime_format=model.datetime_format,
+        time_format=model.time_format, decimal_format=model.decimal_format,
+        tzinfo=None, serialize_types=model.serialize_types
+    )
+    return serializer.serialize
+
+
+def _default_fields(model):
+    """Get the fields to_dict() includes for a model, from its serialize rules"""
+    if model.serialize_only:
+        return tuple(model.serialize_only)
+
+    excluded = set()
+    for rule in model.serialize_rules:
+        if not rule.startswith('-') or '.' in rule:
+            raise ValueError(f"Can't compile serialize rule {rule!r} of {model.__name__}")
+        excluded.add(rule[1:])
+
+    return tuple(key for key in inspect(model).attrs.keys() if key not in excluded)
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(model, only=None):
+    """
+    Generate a flat serializer equivalent to a model's to_dict()
+
+    The function is generated once per model and field list, and reads each
+    field and formats it directly instead of walking serialize rules for
+    every row.
+
+    Args:
+        model: SerializerMixin model class
+        only: Optional tuple of fields, like to_dict(only=...)
+
+    Returns:
+        Function serializing one instance to a dict
+
+    Raises:
+        ValueError: If a field is a relationship or the rules can't be compiled
+    """
+    mapper = inspect(model)
+    fields = only or _default_fields(model)
+
+    namespace = {}
+    entries = []
+    for field in fields:
+        if field not in mapper.column_attrs:
+            raise ValueError(f"Can't compile field {field!r} of {model.__name__}, only columns are supported")
+
+        formatter = _formatter(mapper.column_attrs[field].columns[0].type, model)
+        if formatter is None:
+            entries.append(f"{field!r}: instance.{field}")
+        else:
+            namespace[f"_format_{field}"] = formatter
+            entries.append(f"{field!r}: _format_{field}(instance.{field})")
+
+    source = f"def serialize(instance):\n    return {{{', '.join(entries)}}}\n"
+    exec(compile(source, f"<serializer {model.__name__}>", 'exec'), namespace)
+    return namespace['serialize']
+
+
+def serialize(instance, only=None):
+    """Serialize a model instance like instance.to_dict(only=...)"""
+    return compile_serializer(type(instance), tuple(only) if only else None)(instance)
+
+
+def fast_jsonify(data):
+    """
+    Create a JSON response like jsonify(), encoded with orjson when possible
+
+    The bytes are the same as jsonify() would produce. Anything orjson would
+    write differently (non-ASCII text, exponent-range floats, types it can't
+    encode) falls back to jsonify(), as does debug-mode pretty printing.
+    The exception is NaN and infinity, which orjson writes as null where
+    jsonify() would write invalid JSON.
+
+    Args:
+        data: JSON-compatible value
+
+    Returns:
+        Response
+    """
+    provider = current_app.json
+    pretty = provider.compact is False or (provider.compact is None and current_app.debug)
+    if orjson is None or pretty or not provider.sort_keys or not provider.ensure_ascii:
+        return jsonify(data)
+
+    try:
+        body = orjson.dumps(data, default=provider.default, option=(
+            orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        ))
+    except TypeError:
+        return jsonify(data)
+
+    if not body.isascii() or INEXACT_FLOAT_PATTERN.search(body):
+        return jsonify(data)
+
+    return current_app.response_class(body + b'\n', mimetype=provider.mimetype)